@@ -0,0 +1,363 @@
+"""Headless batch tools.
+
+    python batch.py generate -n 10000 --difficulty 7 --workers 8 --seed 1 -o puzzles.jsonl
+    python batch.py find --rating 8 --max-rating 9 -n 5 --workers 8 -o hard.jsonl
+    python batch.py solve puzzles.txt --backend dlx --workers 8 -o solutions.tsv
+
+`generate` makes N puzzles across a process pool and appends one JSON object
+per line to the output file as each puzzle completes, so a long run can be
+watched (or interrupted) without losing finished work:
+
+    {"index": 0, "seed": "1-0", "difficulty": 7, "rating": 7, "technique": "xy_wing",
+     "clues": 25, "puzzle": "4..7...", "solution": "4567..."}
+
+`difficulty` is the target rating, `rating` the one the puzzle got (see
+rater.py) and `technique` the hardest technique it needs.
+
+Puzzle `index` is generated with its own RNG seeded from "<seed>-<index>",
+so a run is reproducible no matter how the jobs are spread over the workers,
+and a single puzzle can be regenerated from its seed. With --store DB the
+records are also inserted into a puzzle_store.py database, skipping puzzles
+it already holds.
+
+`find` is for ratings that a single dig rarely hits. It runs one dig per
+candidate grid on all workers at once (rejection sampling) and keeps the
+first candidate whose rating falls into the requested band, cancelling the
+candidates still queued and stopping the digs still running; records are
+written as for `generate`. The success rate and time to the first match are
+reported on stderr.
+
+`solve` streams a puzzle file in the one-line-per-puzzle format (81
+characters, '.' or '0' for empty cells; blank lines and lines starting with
+'#' are skipped) and writes one tab-separated line per puzzle, in input order:
+
+    <puzzle>    <first solution, or - if none>    unique|multiple|none|invalid
+
+The file is read lazily and handed to the workers in chunks, so memory use
+does not grow with the size of the corpus. With NumPy installed, each chunk
+is propagated as one batch (see vector_solver.py) and only the puzzles that
+still need a search go to --backend.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from board import Board
+from generator import MAX_TRIES, generate_random_start_board, generate_puzzle
+from puzzle_store import PuzzleStore
+from solver import BACKENDS, DEFAULT_BACKEND, find_all_solutions
+
+# Set in find_rated's worker processes: once it is set the digs running there
+# stop with SearchCancelled
+_cancel = None
+
+
+def _init_worker(cancel):
+    global _cancel
+    _cancel = cancel
+
+
+def generate_one(index, difficulty, seed, tries=MAX_TRIES):
+    """Generates puzzle number `index` of a run; executed in the worker processes."""
+    job_seed = f"{seed}-{index}"
+    rng = random.Random(job_seed)
+    start_board = generate_random_start_board(rng)
+    result = generate_puzzle(start_board, difficulty, rng=rng, cancel=_cancel, tries=tries)
+    return {
+        "index": index,
+        "seed": job_seed,
+        "difficulty": difficulty,
+        "rating": result.rating.rating,
+        "technique": result.rating.hardest,
+        "clues": sum(1 for row in result.puzzle for num in row if num),
+        "puzzle": Board.from_rows(result.puzzle).to_string(),
+        "solution": Board.from_rows(result.solution).to_string(),
+    }
+
+
+def generate_batch(count, difficulty, workers=None, seed=None):
+    """
+    Yields `count` generated puzzle records in completion order.
+    At most a few jobs per worker are queued at a time, so memory stays flat
+    however large `count` is. workers=1 generates in this process.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for index in range(count):
+            yield generate_one(index, difficulty, seed)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        next_index = 0
+        pending = set()
+        while next_index < count or pending:
+            while next_index < count and len(pending) < workers * 4:
+                pending.add(pool.submit(generate_one, next_index, difficulty, seed))
+                next_index += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+# candidates: digs completed. matches: how many of them fell into the band.
+# success_rate: matches / candidates. first_match: seconds until the first
+# match, None if there was none. elapsed: total seconds.
+SamplingStats = namedtuple("SamplingStats", "candidates matches success_rate first_match elapsed")
+
+
+def find_rated(min_rating, max_rating=None, workers=None, seed=None, max_candidates=10_000, timeout=None):
+    """
+    Looks for a puzzle rated between `min_rating` and `max_rating` (default:
+    exactly `min_rating`) by rejection sampling: every candidate is a single
+    dig targeting `max_rating` on a fresh grid, a few per worker are in
+    flight at a time, and the first candidate in the band wins. Gives up after
+    `max_candidates` digs or `timeout` seconds. Returns (record or None,
+    SamplingStats). Raises ValueError if `max_rating` is below `min_rating`.
+
+    As soon as a match comes in (or the time is up) the queued candidates
+    are cancelled and the running ones are told to stop through an event
+    shared with the worker processes; the pool is shut down before this
+    returns, so no workers are left behind.
+    """
+    if max_rating is None:
+        max_rating = min_rating
+    if max_rating < min_rating:
+        raise ValueError(f"Empty rating band: max_rating {max_rating} is below min_rating {min_rating}")
+    if seed is None:
+        seed = random.randrange(2**32)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    deadline = start + timeout if timeout is not None else None
+    candidates = matches = 0
+    found = None
+
+    def check(record):
+        nonlocal candidates, matches, found
+        candidates += 1
+        if min_rating <= record["rating"] <= max_rating:
+            matches += 1
+            if found is None:
+                found = record
+
+    if workers == 1:
+        for index in range(max_candidates):
+            if found is not None or (deadline is not None and time.perf_counter() > deadline):
+                break
+            check(generate_one(index, max_rating, seed, tries=1))
+    else:
+        cancel = multiprocessing.Event()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cancel,))
+        try:
+            next_index = 0
+            pending = set()
+            while found is None and (next_index < max_candidates or pending):
+                while next_index < max_candidates and len(pending) < workers * 2:
+                    pending.add(pool.submit(generate_one, next_index, max_rating, seed, 1))
+                    next_index += 1
+                remaining = deadline - time.perf_counter() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    check(future.result())
+        finally:
+            cancel.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    stats = SamplingStats(candidates, matches, matches / candidates if candidates else 0.0,
+                          elapsed if found is not None else None, elapsed)
+    return found, stats
+
+
+def read_puzzle_lines(lines):
+    """Yields the puzzle lines of an iterable of text lines, skipping blanks and # comments."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _solve_result(line, solutions):
+    status = "none" if not solutions else "unique" if len(solutions) == 1 else "multiple"
+    return line, Board.from_rows(solutions[0]).to_string() if solutions else None, status
+
+def solve_line(line, backend=DEFAULT_BACKEND):
+    """Solves one puzzle line. Returns (line, solution line or None, status)."""
+    try:
+        board = Board.from_string(line)
+    except ValueError:
+        return line, None, "invalid"
+    return _solve_result(line, find_all_solutions(board, 2, backend))
+
+def solve_chunk(lines, backend=DEFAULT_BACKEND):
+    """Solves a list of puzzle lines as one batch; executed in the worker processes."""
+    # Imported here, so jobs that do not solve never load NumPy
+    from vector_solver import find_all_solutions_batch
+
+    boards = []
+    for line in lines:
+        try:
+            boards.append(Board.from_string(line))
+        except ValueError:
+            boards.append(None)
+    solutions = iter(find_all_solutions_batch([board for board in boards if board is not None], 2, backend))
+    return [_solve_result(line, next(solutions)) if board is not None else (line, None, "invalid")
+            for line, board in zip(lines, boards)]
+
+
+def solve_stream(lines, backend=DEFAULT_BACKEND, workers=None, chunk_size=500):
+    """
+    Yields solve_line results for every puzzle line in `lines`, in input
+    order. `lines` is consumed lazily: with a process pool only a couple of
+    chunks per worker are read ahead. workers=1 solves in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    puzzle_lines = read_puzzle_lines(lines)
+    if workers == 1:
+        for chunk in _chunks(puzzle_lines, chunk_size):
+            yield from solve_chunk(chunk, backend)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk in _chunks(puzzle_lines, chunk_size):
+            in_flight.append(pool.submit(solve_chunk, chunk, backend))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="generate many puzzles")
+    gen.add_argument("-n", "--count", type=int, required=True, help="number of puzzles")
+    gen.add_argument("-d", "--difficulty", type=int, default=5, choices=range(1, 11), metavar="1-10",
+                     help="target difficulty rating, default 5")
+    gen.add_argument("-w", "--workers", type=int, default=None, help="worker processes, default: CPU count")
+    gen.add_argument("--seed", type=int, default=None, help="base seed for a reproducible run")
+    gen.add_argument("-o", "--output", default="-", help="JSON lines output file (appended), default stdout")
+    gen.add_argument("--store", default=None, metavar="DB", help="also insert the puzzles into this puzzle store")
+
+    find = sub.add_parser("find", help="find puzzles of a rating band by rejection sampling")
+    find.add_argument("-r", "--rating", type=int, required=True, choices=range(1, 11), metavar="1-10",
+                      help="lowest acceptable rating")
+    find.add_argument("--max-rating", type=int, default=None, choices=range(1, 11), metavar="1-10",
+                      help="highest acceptable rating, default: --rating")
+    find.add_argument("-n", "--count", type=int, default=1, help="number of puzzles to find, default 1")
+    find.add_argument("-w", "--workers", type=int, default=None, help="worker processes, default: CPU count")
+    find.add_argument("--seed", type=int, default=None, help="base seed for a reproducible run")
+    find.add_argument("--max-candidates", type=int, default=10_000, help="digs per puzzle before giving up")
+    find.add_argument("--timeout", type=float, default=None, help="seconds per puzzle before giving up")
+    find.add_argument("-o", "--output", default="-", help="JSON lines output file (appended), default stdout")
+
+    solve = sub.add_parser("solve", help="solve a file of one-line puzzles")
+    solve.add_argument("input", help="puzzle file, one 81-character puzzle per line; - for stdin")
+    solve.add_argument("-b", "--backend", default=DEFAULT_BACKEND, choices=sorted(BACKENDS),
+                       help=f"solver backend, default {DEFAULT_BACKEND}")
+    solve.add_argument("-w", "--workers", type=int, default=None, help="worker processes, default: CPU count")
+    solve.add_argument("--chunk-size", type=int, default=500, help="puzzles per job sent to a worker")
+    solve.add_argument("-o", "--output", default="-", help="output file, default stdout")
+    args = parser.parse_args()
+    if args.command == "find" and args.max_rating is not None and args.max_rating < args.rating:
+        parser.error(f"--max-rating {args.max_rating} is below --rating {args.rating}")
+
+    if args.command == "generate":
+        out = sys.stdout if args.output == "-" else open(args.output, "a")
+        store = PuzzleStore(args.store) if args.store else None
+        pending = []
+        stored = 0
+        start = time.perf_counter()
+        try:
+            for done, record in enumerate(generate_batch(args.count, args.difficulty, args.workers, args.seed), 1):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if store is not None:
+                    pending.append(record)
+                if done % 100 == 0 or done == args.count:
+                    if pending:
+                        stored += store.add_many(pending)
+                        pending = []
+                    rate = done / (time.perf_counter() - start)
+                    print(f"{done}/{args.count} puzzles ({rate:.1f}/s)", file=sys.stderr)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            if store is not None:
+                if pending:
+                    stored += store.add_many(pending)
+                store.close()
+                print(f"{stored} new puzzles stored in {args.store}", file=sys.stderr)
+
+    elif args.command == "find":
+        out = sys.stdout if args.output == "-" else open(args.output, "a")
+        seed = args.seed if args.seed is not None else random.randrange(2**32)
+        candidates = matches = 0
+        first_matches = []
+        try:
+            for run in range(args.count):
+                record, stats = find_rated(args.rating, args.max_rating, args.workers, f"{seed}/{run}",
+                                           args.max_candidates, args.timeout)
+                candidates += stats.candidates
+                matches += stats.matches
+                if record is None:
+                    print(f"No match in {stats.candidates} candidates ({stats.elapsed:.1f}s)", file=sys.stderr)
+                    continue
+                first_matches.append(stats.first_match)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                print(f"Rating {record['rating']} after {stats.candidates} candidates in {stats.first_match:.2f}s",
+                      file=sys.stderr)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if candidates:
+            summary = f"{len(first_matches)}/{args.count} found, success rate {matches / candidates:.1%}"
+            if first_matches:
+                first_matches.sort()
+                summary += (f", time to first match: mean {sum(first_matches) / len(first_matches):.2f}s,"
+                            f" median {first_matches[len(first_matches) // 2]:.2f}s")
+            print(summary, file=sys.stderr)
+
+    elif args.command == "solve":
+        source = sys.stdin if args.input == "-" else open(args.input)
+        out = sys.stdout if args.output == "-" else open(args.output, "w")
+        statuses = Counter()
+        start = time.perf_counter()
+        try:
+            for line, solution, status in solve_stream(source, args.backend, args.workers, args.chunk_size):
+                out.write(f"{line}\t{solution or '-'}\t{status}\n")
+                statuses[status] += 1
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if out is not sys.stdout:
+                out.close()
+        total = sum(statuses.values())
+        elapsed = time.perf_counter() - start
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+        print(f"Solved {total} puzzles in {elapsed:.1f}s ({total / elapsed:.1f}/s): {summary}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
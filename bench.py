@@ -0,0 +1,484 @@
+"""Benchmarks for the solver and generator.
+
+    python bench.py solvers [--backend NAME ...] [--repeat N] [--timeout S] [--json FILE]
+    python bench.py generator [--count N] [--json FILE]
+    python bench.py all [--json FILE]
+    python bench.py grids [--seconds S]
+    python bench.py gui [--actions N] [--size 9] [--json FILE]
+    python bench.py startup [--runs N] [--json FILE]
+
+`solvers` runs every backend over the fixed corpus in bench_corpus.txt
+(easy, hard, 17-clue and pathological puzzles; each solve also proves the
+solution unique) and reports per backend and category: puzzles per second,
+p50/p99 latency, mean search nodes and peak memory. Every solve is capped at
+`--timeout` seconds, since the pathological puzzles take the reference
+backtracker practically forever; capped solves are counted as timeouts.
+
+`generator` times generate_random_start_board + generate_puzzle for a few
+target ratings with fixed seeds, and is_valid calls over the corpus.
+`all` runs both. With --json the results, tagged with the git commit, are
+written to a file (- for stdout) so runs can be diffed across commits.
+
+`grids` measures how many complete random grids per second each way of
+making one produces. "legacy" is the old generate_random_start_board
+pipeline (diagonal boxes, solve, remove 40 cells with a solvability check
+each, then solve back to a full grid), run with the original backtracker
+and with the bitmask engine.
+
+`gui` needs a display. It opens the app on a generated puzzle and times
+simulated clicks and key presses from the event handler until the canvas is
+updated (update_idletasks): selecting a cell, entering and erasing a value,
+moving with the arrow keys. It also times a full redraw of every cell, and
+the old way of drawing, which deleted and recreated every canvas item.
+
+`startup` checks import and startup times against STARTUP_BUDGETS_MS, each
+the median of --runs fresh interpreters: importing sudoku_core, the first
+solve through it, importing googoku, and the time from starting the app to
+its first drawn frame (needs a display; skipped without one). It exits with
+status 1 if any of them is over its budget.
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from board import Board, BOX_SIZES, DIGIT_CHARS
+from solver import BACKENDS, SearchLimit, SearchLimitReached, find_all_solutions, is_valid, solve_first
+from generator import DigBudget, generate_puzzle, generate_random_start_board, generate_solved_grid
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_corpus.txt")
+
+# Budgets for `bench.py startup`, in milliseconds
+STARTUP_BUDGETS_MS = {
+    "import sudoku_core": 5,
+    "first solve": 50,
+    "import googoku": 100,
+    "first frame": 500,
+}
+
+
+def legacy_full_grid(rng, backend):
+    board = [[0 for _ in range(9)] for _ in range(9)]
+    for i in range(0, 9, 3):
+        nums = list(range(1, 10))
+        rng.shuffle(nums)
+        for r in range(3):
+            for c in range(3):
+                board[i+r][i+c] = nums.pop()
+    full_board = solve_first(board, backend)
+    if not full_board:
+        return legacy_full_grid(rng, backend)
+
+    temp_puzzle = copy.deepcopy(full_board)
+    removed_count = 0
+    cells = [(r, c) for r in range(9) for c in range(9)]
+    rng.shuffle(cells)
+    for r, c in cells:
+        if removed_count >= 40:
+            break
+        val = temp_puzzle[r][c]
+        temp_puzzle[r][c] = 0
+        if solve_first(temp_puzzle, backend):
+            removed_count += 1
+        else:
+            temp_puzzle[r][c] = val
+
+    # generate_sudoku then solved the start board again
+    return solve_first(temp_puzzle, backend)
+
+
+GRID_METHODS = {
+    "legacy (backtrack)": lambda rng: legacy_full_grid(rng, "backtrack"),
+    "legacy (bitmask)": lambda rng: legacy_full_grid(rng, "bitmask"),
+    "fill": lambda rng: generate_solved_grid(rng, "fill"),
+    "pattern": lambda rng: generate_solved_grid(rng, "pattern"),
+}
+
+
+def bench_grids(seconds=2.0, seed=0):
+    """Returns {method: grids per second}, running each method for about `seconds`."""
+    results = {}
+    for name, make_grid in GRID_METHODS.items():
+        rng = random.Random(seed)
+        count = 0
+        start = time.perf_counter()
+        while True:
+            make_grid(rng)
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+        results[name] = count / elapsed
+    return results
+
+
+def load_corpus(path=CORPUS_FILE):
+    """Returns {category: [Board]} from a corpus file of puzzle lines under "## <category>" headers."""
+    corpus = {}
+    puzzles = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("## "):
+                puzzles = corpus.setdefault(line[3:], [])
+            elif line and not line.startswith("#"):
+                puzzles.append(Board.from_string(line))
+    return corpus
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _latency_stats(latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "per_sec": len(latencies) / total if total else None,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def _peak_memory(run):
+    """Peak traced allocation in KiB while `run()` executes (tracemalloc, so measured separately from timing)."""
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _solve_capped(board, backend, timeout):
+    """Checks `board` for a unique solution. Returns (seconds, nodes, timed out)."""
+    limit = SearchLimit(deadline=time.monotonic() + timeout)
+    start = time.perf_counter()
+    try:
+        find_all_solutions(board, 2, backend, limit)
+        timed_out = False
+    except SearchLimitReached:
+        timed_out = True
+    return time.perf_counter() - start, limit.nodes, timed_out
+
+
+def bench_solvers(corpus, backends=BACKENDS, repeat=3, timeout=1.0):
+    """Returns {backend: {category: stats}} for solving every corpus puzzle `repeat` times."""
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for category, puzzles in corpus.items():
+            latencies = []
+            nodes = timeouts = 0
+            for _ in range(repeat):
+                for board in puzzles:
+                    elapsed, used, timed_out = _solve_capped(board, backend, timeout)
+                    latencies.append(elapsed)
+                    nodes += used
+                    timeouts += timed_out
+            peak = 0.0
+            for board in puzzles:
+                peak = max(peak, _peak_memory(lambda: _solve_capped(board, backend, timeout)))
+            results[backend][category] = dict(_latency_stats(latencies), puzzles=len(puzzles), runs=len(latencies),
+                                              timeouts=timeouts, nodes_mean=nodes / len(latencies), peak_kib=peak)
+    return results
+
+
+def bench_generator(count=10, difficulties=(2, 5, 8), seed=0):
+    """Returns {difficulty: stats} for generating `count` puzzles per target rating."""
+    results = {}
+    for difficulty in difficulties:
+        rng = random.Random(f"{seed}-{difficulty}")
+        latencies = []
+        nodes = hits = 0
+        check_time = rating_time = 0.0
+        for _ in range(count):
+            start = time.perf_counter()
+            result = generate_puzzle(generate_random_start_board(rng), difficulty, rng=rng)
+            latencies.append(time.perf_counter() - start)
+            nodes += result.stats.solver.nodes
+            hits += result.rating.rating == difficulty
+            check_time += result.stats.check_time
+            rating_time += result.stats.rating_time
+        rng = random.Random(f"{seed}-{difficulty}")
+        peak = _peak_memory(lambda: generate_puzzle(generate_random_start_board(rng), difficulty, rng=rng))
+        results[difficulty] = dict(_latency_stats(latencies), runs=count, on_target=hits,
+                                   nodes_mean=nodes / count, peak_kib=peak,
+                                   check_share=check_time / sum(latencies), rating_share=rating_time / sum(latencies))
+    return results
+
+
+def bench_is_valid(corpus, repeat=5):
+    """Returns is_valid calls per second, checking every digit in every empty corpus cell."""
+    boards = [board.to_rows() for puzzles in corpus.values() for board in puzzles]
+    calls = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for rows in boards:
+            for r in range(9):
+                for c in range(9):
+                    if not rows[r][c]:
+                        for num in range(1, 10):
+                            is_valid(rows, r, c, num)
+                        calls += 9
+    return {"calls": calls, "per_sec": calls / (time.perf_counter() - start)}
+
+
+def legacy_draw_all_cells(gui):
+    """The app's old _draw_all_cells: deletes every cell item and creates them again."""
+    canvas = gui.canvas
+    canvas.delete("legacy")
+    cs = gui.cell_size
+    for r in range(gui.size):
+        for c in range(gui.size):
+            x0, y0 = c * cs, r * cs
+            if (r, c) in gui.highlighted_cells:
+                canvas.create_rectangle(x0, y0, x0 + cs, y0 + cs, fill=gui.color_highlight, outline="", tags="legacy")
+            elif gui.active_cell == (r, c):
+                canvas.create_rectangle(x0, y0, x0 + cs, y0 + cs, fill=gui.color_active_cell, outline="",
+                                        tags="legacy")
+            num = gui.initial_board[r][c] or gui.user_values[r][c]
+            if num:
+                canvas.create_text(x0 + cs / 2, y0 + cs / 2, text=DIGIT_CHARS[num], font=gui.value_font,
+                                   fill=gui.color_fixed_text, tags="legacy")
+            else:
+                for i, note in enumerate(gui.notes.digits(r * gui.size + c)):
+                    canvas.create_text(x0 + (i % gui.box + 0.5) * cs / gui.box, y0 + (i // gui.box + 0.5) * cs / gui.box,
+                                       text=DIGIT_CHARS[note], font=gui.note_font, fill=gui.color_note_text,
+                                       tags="legacy")
+
+
+def bench_gui(actions=200, box=3, seed=0):
+    """
+    Returns {action: latency stats} for the GUI's redraws; needs a display.
+    Every action runs `actions` times on random empty cells of one puzzle.
+    """
+    import tkinter as tk
+    from types import SimpleNamespace
+    from googoku import SudokuGUI
+
+    root = tk.Tk()
+    try:
+        gui = SudokuGUI(root)
+        # The pool starts once the window is drawn; stop it and the first generation
+        while gui.puzzle_pool is None:
+            root.update()
+            time.sleep(0.01)
+        gui.puzzle_pool.stop()
+        gui.cancel_generation()
+        while gui.generation_queue is not None:
+            root.update()
+            time.sleep(0.01)
+        rng = random.Random(seed)
+        result = generate_puzzle(generate_random_start_board(rng, box), 5, DigBudget(time_limit=1.0), rng)
+        gui._show_new_puzzle(result.puzzle, None, result.solution)
+        root.update()
+        size, cs = gui.size, gui.cell_size
+        empty = [(r, c) for r, row in enumerate(result.puzzle) for c, num in enumerate(row) if not num]
+
+        def key(keysym):
+            return lambda: gui._key_press(SimpleNamespace(keysym=keysym))
+
+        def full_redraw():
+            gui.cell_looks.clear()
+            gui._draw_all_cells()
+
+        latencies = {name: [] for name in ("select", "enter", "erase", "move", "full redraw", "legacy redraw")}
+        for _ in range(actions):
+            r, c = rng.choice(empty)
+            steps = [
+                ("select", lambda: gui._canvas_click(SimpleNamespace(x=c * cs + 1, y=r * cs + 1))),
+                ("enter", key(DIGIT_CHARS[rng.randint(1, size)])),
+                ("erase", key("BackSpace")),
+                ("move", key(rng.choice(("Up", "Down", "Left", "Right")))),
+                ("full redraw", full_redraw),
+                ("legacy redraw", lambda: legacy_draw_all_cells(gui)),
+            ]
+            for name, action in steps:
+                start = time.perf_counter()
+                action()
+                root.update_idletasks()
+                latencies[name].append(time.perf_counter() - start)
+            gui.canvas.delete("legacy")
+        return {name: dict(_latency_stats(values), mean_ms=sum(values) / len(values) * 1000)
+                for name, values in latencies.items()}
+    finally:
+        root.destroy()
+
+
+# Code run in a fresh interpreter by bench_startup; it sets `end`, and
+# `start` is taken right before it
+_STARTUP_CODE = {
+    "import sudoku_core": "import sudoku_core\nend = time.perf_counter()",
+    "first solve": "import sudoku_core\nsudoku_core.solve_first([[0] * 9 for _ in range(9)])\n"
+                   "end = time.perf_counter()",
+    "import googoku": "import googoku\nend = time.perf_counter()",
+    # With an empty pool and store in a temporary directory, so nothing is
+    # read from or written to the user's
+    "first frame": """
+import os, tempfile, tkinter as tk
+import googoku
+home = tempfile.mkdtemp()
+googoku.POOL_FILE = os.path.join(home, "pool.json")
+googoku.STORE_FILE = os.path.join(home, "puzzles.sqlite3")
+root = tk.Tk()
+gui = googoku.SudokuGUI(root)
+while gui.first_frame_time is None:
+    root.update()
+end = gui.first_frame_time
+gui.puzzle_pool.stop()
+gui.cancel_generation()
+""",
+}
+
+
+def bench_startup(runs=5):
+    """
+    Returns {step: {median_ms, runs_ms, budget_ms, ok}} for the steps in
+    STARTUP_BUDGETS_MS, every run in a new interpreter; a step that fails
+    (the first frame without a display) gets {error, budget_ms} instead.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, code in _STARTUP_CODE.items():
+        script = f"import time\nstart = time.perf_counter()\n{code}\nprint(end - start)\n"
+        budget = STARTUP_BUDGETS_MS[name]
+        times = []
+        for _ in range(runs):
+            done = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=here,
+                                  timeout=60)
+            if done.returncode != 0:
+                error = done.stderr.strip().splitlines()
+                results[name] = {"error": error[-1] if error else f"exit status {done.returncode}",
+                                 "budget_ms": budget}
+                break
+            times.append(float(done.stdout.split()[-1]) * 1000)
+        else:
+            median = sorted(times)[len(times) // 2]
+            results[name] = {"median_ms": median, "runs_ms": times, "budget_ms": budget, "ok": median <= budget}
+    return results
+
+
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def _print_table(title, rows, file=None):
+    print(title, file=file)
+    for name, stats in rows.items():
+        line = (f"  {name!s:24} {stats['per_sec'] or 0:10.1f}/s  p50 {stats['p50_ms']:9.2f} ms"
+                f"  p99 {stats['p99_ms']:9.2f} ms  {stats['nodes_mean']:10.1f} nodes  {stats['peak_kib']:8.1f} KiB")
+        if stats.get("timeouts"):
+            line += f"  {stats['timeouts']} timeouts"
+        if "on_target" in stats:
+            line += (f"  {stats['on_target']}/{stats['runs']} on target, time: {stats['check_share']:.0%} uniqueness"
+                     f" checks, {stats['rating_share']:.0%} rating")
+        print(line, file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    grids = sub.add_parser("grids", help="complete grids per second")
+    grids.add_argument("--seconds", type=float, default=2.0, help="time per method")
+    gui = sub.add_parser("gui", help="GUI redraw latency (needs a display)")
+    gui.add_argument("--actions", type=int, default=200, help="runs of every action")
+    gui.add_argument("--size", type=int, default=9, choices=[box * box for box in BOX_SIZES], help="grid size")
+    gui.add_argument("--json", metavar="FILE", help="also write the results as JSON (- for stdout)")
+    startup = sub.add_parser("startup", help="import and startup times against their budgets")
+    startup.add_argument("--runs", type=int, default=5, help="fresh interpreters per step")
+    startup.add_argument("--json", metavar="FILE", help="also write the results as JSON (- for stdout)")
+    for name, help_text in (("solvers", "solver backends on the fixed corpus"),
+                            ("generator", "puzzle generation and is_valid"),
+                            ("all", "solvers and generator")):
+        cmd = sub.add_parser(name, help=help_text)
+        if name != "generator":
+            cmd.add_argument("-b", "--backend", action="append", choices=sorted(BACKENDS),
+                             help="backend to run (repeatable), default: all")
+            cmd.add_argument("--repeat", type=int, default=3, help="solves per corpus puzzle")
+            cmd.add_argument("--timeout", type=float, default=1.0, help="seconds before a solve is capped")
+            cmd.add_argument("--corpus", default=CORPUS_FILE, help="corpus file")
+        if name != "solvers":
+            cmd.add_argument("--count", type=int, default=10, help="puzzles per target rating")
+        cmd.add_argument("--json", metavar="FILE", help="also write the results as JSON (- for stdout)")
+    args = parser.parse_args()
+
+    if args.command in ("solvers", "generator", "all"):
+        report = {"meta": _meta()}
+        # Keep stdout clean for the JSON
+        table_file = sys.stderr if args.json == "-" else sys.stdout
+        corpus = load_corpus(getattr(args, "corpus", CORPUS_FILE))
+        if args.command in ("solvers", "all"):
+            report["solvers"] = bench_solvers(corpus, args.backend or list(BACKENDS), args.repeat, args.timeout)
+            for backend, categories in report["solvers"].items():
+                _print_table(f"{backend}:", categories, table_file)
+        if args.command in ("generator", "all"):
+            report["generator"] = bench_generator(args.count)
+            _print_table("generate_puzzle by target rating:", report["generator"], table_file)
+            report["is_valid"] = bench_is_valid(corpus)
+            print(f"is_valid: {report['is_valid']['per_sec']:.0f} calls/s", file=table_file)
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        elif args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+    elif args.command == "gui":
+        report = {"meta": _meta(), "gui": bench_gui(args.actions, round(args.size ** 0.5))}
+        table_file = sys.stderr if args.json == "-" else sys.stdout
+        print(f"redraw latency, {args.size}x{args.size}:", file=table_file)
+        for name, stats in report["gui"].items():
+            print(f"  {name:16} mean {stats['mean_ms']:8.2f} ms  p50 {stats['p50_ms']:8.2f} ms"
+                  f"  p99 {stats['p99_ms']:8.2f} ms", file=table_file)
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        elif args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+    elif args.command == "startup":
+        report = {"meta": _meta(), "startup": bench_startup(args.runs)}
+        table_file = sys.stderr if args.json == "-" else sys.stdout
+        for name, stats in report["startup"].items():
+            if "error" in stats:
+                print(f"  {name:18} skipped: {stats['error']}", file=table_file)
+            else:
+                print(f"  {name:18} median {stats['median_ms']:8.1f} ms  budget {stats['budget_ms']:5} ms"
+                      f"  {'ok' if stats['ok'] else 'OVER BUDGET'}", file=table_file)
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        elif args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        if not all(stats.get("ok", True) for stats in report["startup"].values()):
+            sys.exit(1)
+
+    elif args.command == "grids":
+        for name, rate in bench_grids(args.seconds).items():
+            print(f"{name:20} {rate:10.1f} grids/s  {1e6 / rate:12.1f} µs/grid")
+
+
+if __name__ == "__main__":
+    main()
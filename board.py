@@ -0,0 +1,219 @@
+"""Compact Sudoku board and precomputed index tables.
+
+Cells are numbered 0-80 row by row. Board stores them in one 81-byte
+bytearray (0 for empty), so copying a board is a single slice instead of a
+copy.deepcopy of nine lists. Boards convert to and from the 9x9 list-of-lists
+format used by the GUI and the JSON files, and to and from the standard
+81-character line format.
+
+Besides 9x9, grids of 4x4, 16x16 and 25x25 cells (boxes of 2, 4 and 5) are
+supported. Their index tables come from geometry(box); the module-level
+tables below are the ones for 9x9, which most of the code is specialised
+to. In lines, digits above 9 are written as letters, A for 10 up to P for 25.
+"""
+
+# Supported box sizes; a grid has box * box rows, columns and digits
+BOX_SIZES = (2, 3, 4, 5)
+
+
+class Geometry:
+    """
+    Index tables of a grid with box x box boxes: `size` rows, columns and
+    digits, `cells` cells numbered row by row.
+
+    cell_row, cell_col, cell_box: row, column and box of each cell.
+    units: the rows, then the columns, then the boxes, as lists of cells.
+    cell_units: indices into units of the row, column and box of each cell.
+    peers: the other cells sharing a row, column or box with each cell.
+    """
+
+    __slots__ = ("box", "size", "cells", "cell_row", "cell_col", "cell_box", "units", "cell_units", "peers")
+
+    def __init__(self, box):
+        size = box * box
+        cells = size * size
+        self.box = box
+        self.size = size
+        self.cells = cells
+        self.cell_row = [i // size for i in range(cells)]
+        self.cell_col = [i % size for i in range(cells)]
+        self.cell_box = [(i // (size * box)) * box + (i % size) // box for i in range(cells)]
+        self.units = ([[r * size + c for c in range(size)] for r in range(size)] +
+                      [[r * size + c for r in range(size)] for c in range(size)] +
+                      [[r * size + c for r in range(br, br + box) for c in range(bc, bc + box)]
+                       for br in range(0, size, box) for bc in range(0, size, box)])
+        self.cell_units = [(self.cell_row[cell], size + self.cell_col[cell], 2 * size + self.cell_box[cell])
+                           for cell in range(cells)]
+        self.peers = [tuple(sorted({p for u in self.cell_units[cell] for p in self.units[u]} - {cell}))
+                      for cell in range(cells)]
+
+    def __repr__(self):
+        return f"Geometry({self.box})"
+
+
+_GEOMETRIES = {}
+
+def geometry(box=3):
+    """The (shared, cached) Geometry for boxes of `box` x `box` cells."""
+    try:
+        return _GEOMETRIES[box]
+    except KeyError:
+        if box not in BOX_SIZES:
+            raise ValueError(f"Unsupported box size {box}, expected one of {BOX_SIZES}") from None
+        return _GEOMETRIES.setdefault(box, Geometry(box))
+
+# Grid side length by number of cells, for the supported sizes
+_SIZE_OF = {box ** 4: box * box for box in BOX_SIZES}
+_BOX_OF = {box ** 4: box for box in BOX_SIZES}
+
+def geometry_of(cell_count):
+    """The Geometry of a grid with `cell_count` cells."""
+    try:
+        return geometry(_BOX_OF[cell_count])
+    except KeyError:
+        raise ValueError(f"No supported grid has {cell_count} cells") from None
+
+
+_NINE = geometry(3)
+CELL_ROW = _NINE.cell_row
+CELL_COL = _NINE.cell_col
+CELL_BOX = _NINE.cell_box
+
+# The 27 units (9 rows, 9 columns, 9 boxes) as lists of cell indices
+UNITS = _NINE.units
+
+# Indices into UNITS of the row, column and box of each cell
+CELL_UNITS = _NINE.cell_units
+
+# The 20 other cells sharing a row, column or box with each cell
+PEERS = _NINE.peers
+
+# Line character of each cell value, "." for empty
+DIGIT_CHARS = ".123456789ABCDEFGHIJKLMNOP"
+
+# Byte translation tables between cell values and line characters
+_TO_CHAR = DIGIT_CHARS.encode("ascii") + b"?" * (256 - len(DIGIT_CHARS))
+_FROM_CHAR = bytearray([255] * 256)
+_FROM_CHAR[ord("0")] = 0
+for _d, _char in enumerate(DIGIT_CHARS):
+    _FROM_CHAR[ord(_char)] = _FROM_CHAR[ord(_char.lower())] = _d
+_FROM_CHAR = bytes(_FROM_CHAR)
+
+
+class Board:
+    """
+    A board stored as one byte per cell, row by row, 0 for empty cells.
+    9x9 unless built with another size (see BOX_SIZES).
+    """
+
+    __slots__ = ("cells",)
+
+    def __init__(self, cells=None, size=9):
+        if cells is None:
+            self.cells = bytearray(size * size)
+        else:
+            self.cells = bytearray(cells)
+        if len(self.cells) not in _SIZE_OF:
+            raise ValueError(f"A board has 16, 81, 256 or 625 cells, got {len(self.cells)}")
+
+    @property
+    def size(self):
+        """Number of rows, columns and digits."""
+        return _SIZE_OF[len(self.cells)]
+
+    @property
+    def geometry(self):
+        return geometry(_BOX_OF[len(self.cells)])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a board from a list of lists, 9x9 or another supported size."""
+        return cls(num for row in rows for num in row)
+
+    @classmethod
+    def from_string(cls, line):
+        """
+        Parses a line of one character per cell, '.' or '0' for empty cells:
+        81 characters for 9x9, or 16, 256 or 625 for the other sizes.
+        """
+        line = line.strip()
+        if len(line) not in _SIZE_OF:
+            raise ValueError(f"Expected 81 characters (16, 256 or 625 for other sizes), got {len(line)}")
+        cells = line.encode("ascii").translate(_FROM_CHAR)
+        if max(cells) > _SIZE_OF[len(line)]:
+            raise ValueError(f"Invalid character in puzzle line {line!r}")
+        board = cls.__new__(cls)
+        board.cells = bytearray(cells)
+        return board
+
+    def to_rows(self):
+        """The board as a new list of lists."""
+        cells = self.cells
+        size = _SIZE_OF[len(cells)]
+        return [list(cells[r:r + size]) for r in range(0, len(cells), size)]
+
+    def to_string(self):
+        """The board as one line of one character per cell, '.' for empty cells."""
+        return self.cells.translate(_TO_CHAR).decode("ascii")
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.cells = self.cells[:]
+        return board
+
+    def __getitem__(self, pos):
+        row, col = pos
+        return self.cells[row * _SIZE_OF[len(self.cells)] + col]
+
+    def __setitem__(self, pos, num):
+        row, col = pos
+        self.cells[row * _SIZE_OF[len(self.cells)] + col] = num
+
+    def __eq__(self, other):
+        if not isinstance(other, Board):
+            return NotImplemented
+        return self.cells == other.cells
+
+    __hash__ = None # Mutable
+
+    def __repr__(self):
+        return f"Board.from_string({self.to_string()!r})"
+
+    def clue_count(self):
+        return len(self.cells) - self.cells.count(0)
+
+    def empty_cells(self):
+        """Indices of the empty cells."""
+        return [cell for cell, num in enumerate(self.cells) if not num]
+
+
+def board_values(board):
+    """The cell values of a Board or a list of lists, as a new flat list."""
+    if isinstance(board, Board):
+        return list(board.cells)
+    return [num for row in board for num in row]
+
+
+def find_conflicts(board):
+    """
+    Returns the set of cell indices whose value also appears elsewhere in
+    their row, column or box. Counts every digit per unit once, then flags
+    each cell whose digit was counted more than once in one of its units.
+    """
+    values = board_values(board)
+    geo = geometry_of(len(values))
+    cell_units = geo.cell_units
+    stride = geo.size + 1
+    counts = bytearray(3 * geo.size * stride)
+    for cell, num in enumerate(values):
+        if num:
+            for unit in cell_units[cell]:
+                counts[unit * stride + num] += 1
+    conflicts = set()
+    for cell, num in enumerate(values):
+        if num:
+            for unit in cell_units[cell]:
+                if counts[unit * stride + num] > 1:
+                    conflicts.add(cell)
+                    break
+    return conflicts
@@ -0,0 +1,222 @@
+"""Canonical form of a Sudoku board under the validity-preserving symmetries.
+
+Two boards are equivalent if one turns into the other by relabeling the
+digits, permuting the rows within a band or the columns within a stack,
+permuting the bands or the stacks, or transposing. canonical_form returns
+the lexicographically smallest equivalent board (empty cells count as 0),
+so equivalent puzzles get the same canonical form, and canonical_hash a
+short key for deduplication.
+
+There are 2 * 6^8 = 3,359,232 geometric transformations, each with a digit
+relabeling. Instead of trying them all, the canonical board is built one row
+at a time: for a fixed transformation the smallest relabeling numbers the
+digits in order of first appearance, so a row of the result only depends on
+the choices made for the rows above it. The search keeps just the partial
+transformations that produce the smallest rows so far and extends those.
+
+python canonical.py checks canonical_form on random puzzles (see self_test).
+"""
+import hashlib
+import random
+from itertools import permutations, product
+
+from board import Board, board_values
+
+_ORDERS = list(permutations(range(3)))
+
+
+def _first_row_states(grid):
+    """
+    Partial transformations of `grid` (one orientation) whose first row is
+    smallest, as (first row, states). In a valid board the digits of a row
+    are distinct, so with first-appearance numbering the first row is just
+    its filled-cell pattern numbered 1, 2, 3, ...: empty columns go first
+    within every stack and the stacks are ordered by how many clues they hold.
+    A state is (grid, column order, digit labels, labels used, rows left in
+    the band, bands left, rows taken so far).
+    """
+    best = None
+    states = []
+    for r in range(9):
+        row = grid[r]
+        filled = [bool(row[s * 3]) + bool(row[s * 3 + 1]) + bool(row[s * 3 + 2]) for s in range(3)]
+        stack_orders = [o for o in _ORDERS if [filled[s] for s in o] == sorted(filled)]
+        # Orders of each stack's columns that put its empty cells first
+        within = [[o for o in _ORDERS if sorted(bool(row[s * 3 + i]) for i in o) == [bool(row[s * 3 + i]) for i in o]]
+                  for s in range(3)]
+
+        out = []
+        n = 0
+        for k in sorted(filled):
+            out += [0] * (3 - k) + list(range(n + 1, n + k + 1))
+            n += k
+        out = tuple(out)
+        if best is not None and out > best:
+            continue
+        if best is None or out < best:
+            best = out
+            states = []
+
+        band = r // 3
+        rest = tuple(x for x in range(band * 3, band * 3 + 3) if x != r)
+        bands = tuple(b for b in range(3) if b != band)
+        for stacks in stack_orders:
+            for orders in product(*within):
+                colperm = tuple(s * 3 + i for s in stacks for i in orders[s])
+                labels = [0] * 10
+                n = 0
+                for c in colperm:
+                    if row[c]:
+                        n += 1
+                        labels[row[c]] = n
+                states.append((grid, colperm, labels, n, rest, bands, (r,)))
+    return best, states
+
+
+def _extend(states):
+    """
+    Appends every allowed next row to every state and keeps the states
+    whose new row is smallest. Returns (that row, the kept states).
+    """
+    best = None
+    kept = []
+    for grid, colperm, labels, n, rest, bands, order in states:
+        if rest:
+            choices = [(r, tuple(x for x in rest if x != r), bands) for r in rest]
+        else:
+            choices = [(r, tuple(x for x in range(b * 3, b * 3 + 3) if x != r), tuple(x for x in bands if x != b))
+                       for b in bands for r in range(b * 3, b * 3 + 3)]
+        for r, new_rest, new_bands in choices:
+            row = grid[r]
+            new_labels = labels[:]
+            m = n
+            out = []
+            for c in colperm:
+                v = row[c]
+                if v:
+                    label = new_labels[v]
+                    if not label:
+                        m += 1
+                        label = new_labels[v] = m
+                    v = label
+                out.append(v)
+            out = tuple(out)
+            if best is not None and out > best:
+                continue
+            if best is None or out < best:
+                best = out
+                kept = []
+            kept.append((grid, colperm, new_labels, m, new_rest, new_bands, order + (r,)))
+    return best, kept
+
+
+def _dedupe(states):
+    """
+    Drops states whose remaining rows, as seen through their column order
+    and digit labels, equal those of a state already kept: both would
+    produce exactly the same continuations. This is what keeps very
+    symmetric boards (the empty board, say) from blowing up.
+    """
+    seen = set()
+    unique = []
+    for state in states:
+        grid, colperm, labels, n, rest, bands, order = state
+
+        def view(r):
+            row = grid[r]
+            return tuple(labels[row[c]] or (10 + row[c] if row[c] else 0) for c in colperm)
+
+        key = (tuple(sorted(view(r) for r in rest)),
+               tuple(sorted(tuple(sorted(view(r) for r in range(b * 3, b * 3 + 3))) for b in bands)))
+        if key not in seen:
+            seen.add(key)
+            unique.append(state)
+    return unique
+
+
+def _canonical_rows(board):
+    """The rows of canonical_form(board) and one state that produces them."""
+    values = board_values(board)
+    grid = [values[r * 9:r * 9 + 9] for r in range(9)]
+    transposed = [list(col) for col in zip(*grid)]
+
+    first, states = _first_row_states(grid)
+    other_first, other_states = _first_row_states(transposed)
+    if other_first < first:
+        first, states = other_first, other_states
+    elif other_first == first:
+        states += other_states
+
+    rows = [first]
+    for _ in range(8):
+        row, states = _extend(_dedupe(states))
+        rows.append(row)
+    return rows, states[0]
+
+
+def canonical_form(board):
+    """
+    The lexicographically smallest board equivalent to `board` (a Board or
+    9x9 list of lists) under digit relabeling, row and column permutations
+    within bands and stacks, band and stack permutations and transposition,
+    as a new Board. The board must not contain a digit twice in a row.
+    """
+    rows, _state = _canonical_rows(board)
+    return Board(v for row in rows for v in row)
+
+
+def canonical_hash(board):
+    """A 32-character hex digest of canonical_form(board), for use as a dedup key."""
+    return hashlib.blake2b(canonical_form(board).cells, digest_size=16).hexdigest()
+
+
+# --- Self-test ---
+
+def _is_symmetry(order):
+    """Whether `order` (9 row or column indices) keeps bands together, as the symmetries do."""
+    return all(len({i // 3 for i in order[b * 3:b * 3 + 3]}) == 1 for b in range(3))
+
+
+def self_test(trials=30, seed=None):
+    """
+    Checks canonical_form on random generated puzzles and on a board with
+    one clue per stack in every row. The form must be equivalent to the
+    puzzle (the row and column orders the search ended with must be
+    symmetries, and together with its digit labels map the puzzle to the
+    form), canonical_form of the form must be the form itself, and a
+    randomly transformed copy must give the same form. Returns the number
+    of failures.
+    """
+    from generator import DigBudget, generate_puzzle, generate_solved_grid, transform_grid
+
+    rng = random.Random(seed)
+    grid = generate_solved_grid(rng)
+    boards = [[[grid[r][c] if c % 3 == r % 3 else 0 for c in range(9)] for r in range(9)]]
+    for _ in range(trials):
+        boards.append(generate_puzzle(generate_solved_grid(rng), rng.randint(1, 9), DigBudget(time_limit=0.2),
+                                      rng).puzzle)
+    failures = 0
+    for trial, board in enumerate(boards):
+        rows, (oriented, colperm, labels, _n, _rest, _bands, order) = _canonical_rows(board)
+        form = Board(v for row in rows for v in row)
+        mapped = [tuple(labels[oriented[r][c]] for c in colperm) for r in order]
+        checks = {
+            "equivalent": (_is_symmetry(order) and _is_symmetry(colperm) and mapped == rows and
+                           len(set(labels[1:]) - {0}) == sum(map(bool, labels[1:]))),
+            "idempotent": canonical_form(form) == form,
+            "invariant": canonical_form(transform_grid(board, rng)) == form,
+        }
+        failed = [name for name, ok in checks.items() if not ok]
+        if failed:
+            failures += 1
+            print(f"Board {trial} is not {', '.join(failed)}:")
+            print(Board.from_rows(board).to_string())
+    return failures
+
+
+if __name__ == "__main__":
+    failures = self_test(seed=1)
+    if failures:
+        print(f"❌ canonical_form failed on {failures} boards")
+    else:
+        print("✅ canonical_form is equivalent, idempotent and invariant under transformations")
@@ -0,0 +1,197 @@
+"""Dancing Links (Knuth's Algorithm X) solver for Sudoku.
+
+9x9 Sudoku is an exact cover problem with 324 constraint columns and 729
+candidate rows, one row per (cell, digit) placement:
+
+    columns   0-80   cell (r, c) is filled
+    columns  81-161  row r contains digit d
+    columns 162-242  column c contains digit d
+    columns 243-323  box b contains digit d
+
+The other grid sizes are laid out the same way, with 4 * cells columns and
+cells * size rows.
+
+The links are kept in flat integer lists instead of node objects. The full
+matrix is built once per grid size and copied for every solve; the clues are
+then removed from it by covering their columns before the search starts.
+"""
+from board import board_values, geometry_of
+
+# Matrix dimensions for 9x9
+N_COLUMNS = 324
+N_ROWS = 729
+ROOT = 0
+
+# Link arrays by number of cells
+_templates = {}
+
+
+def _row_columns(row_id, geo):
+    size = geo.size
+    cell, d = divmod(row_id, size)
+    cells = geo.cells
+    return (cell, cells + geo.cell_row[cell] * size + d, 2 * cells + geo.cell_col[cell] * size + d,
+            3 * cells + geo.cell_box[cell] * size + d)
+
+def _build_template(geo):
+    """
+    Builds the link arrays for the full matrix, 324x729 for 9x9.
+    Node 0 is the root, nodes 1-324 are the column headers and each matrix
+    row takes four consecutive nodes after that.
+    """
+    n_columns = 4 * geo.cells
+    n_rows = geo.cells * geo.size
+    n_nodes = 1 + n_columns + n_rows * 4
+    left = list(range(-1, n_nodes - 1))
+    right = list(range(1, n_nodes + 1))
+    up = list(range(n_nodes))
+    down = list(range(n_nodes))
+    column = list(range(n_nodes))
+    row_of = [-1] * n_nodes
+    size = [0] * (n_columns + 1)
+
+    # Header list: root <-> 1 <-> ... <-> 324 <-> root
+    left[ROOT] = n_columns
+    right[n_columns] = ROOT
+
+    first_node = [0] * n_rows
+    node = n_columns + 1
+    for row_id in range(n_rows):
+        first_node[row_id] = node
+        for k, col in enumerate(_row_columns(row_id, geo)):
+            header = col + 1
+            # Append the node at the bottom of its column
+            column[node] = header
+            row_of[node] = row_id
+            up[node] = up[header]
+            down[node] = header
+            down[up[header]] = node
+            up[header] = node
+            size[header] += 1
+            # Circular row list of four nodes
+            left[node] = node - 1 if k else node + 3
+            right[node] = node + 1 if k < 3 else node - 3
+            node += 1
+
+    return (left, right, up, down, column, row_of, size, first_node)
+
+
+def find_all_solutions(board, max_solutions=2, limit=None, stats=None):
+    """
+    Returns up to `max_solutions` solutions of `board` (9x9 or any other
+    supported size) as new lists of lists. A board whose clues already
+    conflict has no solutions. `limit` is an optional solver.SearchLimit
+    ticked once per search node, `stats` an optional solver.SolverStats to
+    count into.
+    """
+    values = board_values(board)
+    geo = geometry_of(len(values))
+    width = geo.size
+    template = _templates.get(geo.cells)
+    if template is None:
+        template = _templates[geo.cells] = _build_template(geo)
+    left, right, up, down, column, row_of, size, first_node = template
+    left = left[:]
+    right = right[:]
+    up = up[:]
+    down = down[:]
+    size = size[:]
+
+    def cover(c):
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(c):
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    # Take the clue rows out of the matrix
+    covered = bytearray(len(size))
+    for cell, num in enumerate(values):
+        if num == 0:
+            continue
+        if num > width:
+            return []
+        node = first_node[cell * width + num - 1]
+        for k in range(4):
+            header = column[node + k]
+            if covered[header]:
+                return [] # Two clues claim the same constraint
+            covered[header] = 1
+            cover(header)
+
+    solutions = []
+    chosen = []
+    if stats is not None:
+        stats.searches += 1
+
+    def search(depth=0):
+        if limit is not None:
+            limit.tick()
+        if stats is not None:
+            stats.nodes += 1
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+        if right[ROOT] == ROOT:
+            for node in chosen:
+                cell, d = divmod(row_of[node], width)
+                values[cell] = d + 1
+            solutions.append([values[r:r + width] for r in range(0, len(values), width)])
+            return len(solutions) >= max_solutions
+
+        # Column with the fewest remaining rows
+        c = right[ROOT]
+        best = c
+        best_size = size[c]
+        while c != ROOT and best_size > 1:
+            if size[c] < best_size:
+                best = c
+                best_size = size[c]
+            c = right[c]
+        if best_size == 0:
+            if stats is not None:
+                stats.backtracks += 1
+            return False
+
+        cover(best)
+        r = down[best]
+        done = False
+        while r != best:
+            chosen.append(r)
+            j = right[r]
+            while j != r:
+                cover(column[j])
+                j = right[j]
+            done = search(depth + 1)
+            j = left[r]
+            while j != r:
+                uncover(column[j])
+                j = left[j]
+            chosen.pop()
+            if done:
+                break
+            r = down[r]
+        uncover(best)
+        return done
+
+    if max_solutions > 0:
+        search()
+    return solutions
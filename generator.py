@@ -0,0 +1,344 @@
+"""Sudoku puzzle generation without any GUI dependency.
+
+generate_sudoku solves a start board to a full grid and then digs clues out
+of it in a single pass over the cells in random order, keeping a removal only
+if the solution stays unique. The dig phase runs under an explicit DigBudget
+(maximum removals, maximum solver nodes and a wall-clock limit); when the
+budget runs out the puzzle dug so far is returned, which is always valid.
+
+Difficulty is a target rating (see rater.py): after every removal the puzzle
+is rated, a removal that makes it harder than the target is put back, and
+digging stops as soon as the target is reached with at most a random number
+of clues left, drawn between MIN_CLUES and MAX_CLUES for every dig. A grid
+whose dig misses the target is replaced by a fresh one. Not every rating
+comes out of a dig equally often (5, 6 and 10 are rare), so the result
+carries the rating the puzzle actually got, which may be the closest one.
+
+generate_puzzle's budget covers all the grids it digs together: they share
+one solver node count and one deadline, and once that runs out the closest
+puzzle so far is returned.
+
+Generation can run in a background thread: the dig phase reports its
+progress through a callback and stops with solver.SearchCancelled as soon
+as a cancel event is set.
+
+Grids of other sizes (4x4, 16x16, 25x25; see board.BOX_SIZES) are generated
+the same way, but the rater only knows 9x9: for them the difficulty sets
+which share of the cells the dig tries to empty, and the rating is None.
+"""
+import random
+import time
+from collections import namedtuple
+
+from board import Board, DIGIT_CHARS, geometry
+from rater import rate
+from solver import (solve_first, random_solution, Digger, GridDigger, SearchLimit, SearchLimitReached,
+                    SearchCancelled, SolverStats)
+
+
+class DigBudget:
+    """
+    Limits for the dig phase of generate_sudoku.
+    max_removals: stop after this many clues have been removed.
+    max_nodes: total solver nodes all uniqueness checks may expand together.
+    time_limit: wall-clock seconds for the whole dig phase.
+    None means no limit.
+    """
+
+    def __init__(self, max_removals=None, max_nodes=100_000, time_limit=5.0):
+        self.max_removals = max_removals
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+
+    def __repr__(self):
+        return (f"DigBudget(max_removals={self.max_removals}, max_nodes={self.max_nodes}, "
+                f"time_limit={self.time_limit})")
+
+
+class GenerationStats:
+    """
+    Where generation spent its effort, summed over every dig it is passed to.
+
+    solver: SolverStats of all uniqueness checks. digs: digs run. removals:
+    cells emptied for good. kept_unique: cells that had to stay because the
+    solution would not be unique without them. put_back: removals undone for
+    overshooting the target rating. check_time / rating_time: seconds in
+    uniqueness checks / in rating. dig_time: seconds in digs overall, so
+    dig_time - check_time - rating_time is the removal bookkeeping itself.
+    """
+
+    __slots__ = ("solver", "digs", "removals", "kept_unique", "put_back", "check_time", "rating_time", "dig_time")
+
+    def __init__(self):
+        self.solver = SolverStats()
+        self.digs = 0
+        self.removals = 0
+        self.kept_unique = 0
+        self.put_back = 0
+        self.check_time = 0.0
+        self.rating_time = 0.0
+        self.dig_time = 0.0
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__[1:]}
+        data["solver"] = self.solver.as_dict()
+        return data
+
+    def __repr__(self):
+        return ("GenerationStats(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")")
+
+
+# puzzle/solution: lists of lists. removed: number of clues dug out. nodes:
+# solver nodes used. elapsed: seconds spent digging. exhausted: the budget ran
+# out before every candidate cell was tried. rating: rater.Rating of the
+# puzzle, None if it is not 9x9. stats: GenerationStats (for generate_puzzle,
+# of all its digs together).
+DigResult = namedtuple("DigResult", "puzzle solution removed nodes elapsed exhausted rating stats")
+
+# A puzzle that reached its target rating is only finished once it is down
+# to a clue count drawn from this range; otherwise easy targets would stop
+# after a few removals, and always at the same count. Puzzles that need only
+# hidden singles still go down to about 24 clues.
+MIN_CLUES = 28
+MAX_CLUES = 36
+
+# Fresh grids generate_puzzle digs before settling for the closest rating
+MAX_TRIES = 10
+
+
+def dig_puzzle(solution, attempts=None, budget=None, rng=random, progress=None, cancel=None, target=None,
+               stats=None, limit=None):
+    """
+    Tries to empty up to `attempts` cells (default: all) of the full grid
+    `solution`, in random order, keeping each removal that leaves the
+    solution unique. With a `target` rating, removals that rate the puzzle
+    above it are put back and the dig stops once the target is reached (see
+    MIN_CLUES); only 9x9 grids can be rated.
+    Returns a DigResult with the best puzzle found within `budget`.
+    `progress(tried, attempts)` is called after every cell tried. Setting the
+    threading.Event `cancel` aborts the dig with SearchCancelled. Counters
+    are added to `stats` (a GenerationStats) if given.
+    A solver.SearchLimit passed as `limit` replaces the node and time limits
+    of `budget` (and `cancel`), so several digs can share one budget; the
+    result's `nodes` are the ones this dig used.
+    """
+    budget = budget or DigBudget()
+    stats = stats if stats is not None else GenerationStats()
+    stats.digs += 1
+    clock = time.perf_counter
+    start = time.monotonic()
+    dig_start = clock()
+    if limit is None:
+        deadline = start + budget.time_limit if budget.time_limit is not None else None
+        limit = SearchLimit(budget.max_nodes, deadline, cancel)
+    deadline = limit.deadline
+    nodes_before = limit.nodes
+    size = len(solution)
+    if size == 9:
+        digger = Digger(solution)
+    elif target is not None:
+        raise ValueError("Only 9x9 puzzles can be dug to a target rating")
+    else:
+        digger = GridDigger(solution)
+
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    rng.shuffle(cells)
+    cells = cells[:attempts]
+
+    removed = 0
+    exhausted = False
+    rating = None
+    stop_clues = rng.randint(MIN_CLUES, MAX_CLUES)
+    for tried, (r, c) in enumerate(cells):
+        if cancel is not None and cancel.is_set():
+            raise SearchCancelled()
+        if budget.max_removals is not None and removed >= budget.max_removals:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            exhausted = True
+            break
+        check_start = clock()
+        try:
+            unique = digger.try_remove(r, c, limit, stats.solver)
+        except SearchLimitReached:
+            # The cell keeps its clue; everything dug so far is still unique
+            exhausted = True
+            break
+        finally:
+            stats.check_time += clock() - check_start
+        if unique:
+            removed += 1
+            if target is not None:
+                rating_start = clock()
+                candidate = rate(digger.puzzle())
+                stats.rating_time += clock() - rating_start
+                if candidate.rating > target:
+                    digger.put_back(r, c)
+                    removed -= 1
+                    stats.put_back += 1
+                else:
+                    rating = candidate
+        else:
+            stats.kept_unique += 1
+        if progress is not None:
+            progress(tried + 1, len(cells))
+        if rating is not None and rating.rating == target and 81 - removed <= stop_clues:
+            break
+
+    puzzle = digger.puzzle()
+    if rating is None and size == 9:
+        rating_start = clock()
+        rating = rate(puzzle)
+        stats.rating_time += clock() - rating_start
+    stats.removals += removed
+    stats.dig_time += clock() - dig_start
+    return DigResult(puzzle, Board(digger.solution).to_rows(), removed, limit.nodes - nodes_before,
+                     time.monotonic() - start, exhausted, rating, stats)
+
+
+def generate_puzzle(puzzle, difficulty=5, budget=None, rng=random, progress=None, cancel=None, tries=MAX_TRIES):
+    """
+    Solves the start board `puzzle` and digs a unique puzzle rated
+    `difficulty` (1-10, see rater.py) out of the solution. If the dig misses
+    the target, fresh grids are tried, `tries` digs in all; failing that, or
+    once `budget` is spent, the puzzle with the closest rating is returned.
+    Returns the DigResult.
+    `budget` bounds the whole call: all digs share its node and time limits
+    (max_removals applies to each dig). `progress(done, total)` counts the
+    cells tried over all `tries` digs, so it only ever grows and jumps to
+    the end when a dig hits the target; `cancel` is passed on to dig_puzzle.
+    The result's stats cover all digs.
+    A start board of another size gets a single dig that tries to empty
+    `difficulty` tenths of its cells, and no rating.
+    """
+    # Ensure the input puzzle is solvable and get a full solution
+    full_solution = solve_first(puzzle)
+    size = len(puzzle)
+    if not full_solution:
+        # If the initial random board isn't solvable, try generating again
+        print("Warning: Initial random board not solvable, regenerating...")
+        return generate_puzzle(generate_random_start_board(rng, _box_of(size)), difficulty, budget, rng, progress,
+                               cancel, tries)
+    if size != 9:
+        return dig_puzzle(full_solution, size * size * difficulty // 10, budget, rng, progress, cancel)
+
+    budget = budget or DigBudget()
+    deadline = time.monotonic() + budget.time_limit if budget.time_limit is not None else None
+    limit = SearchLimit(budget.max_nodes, deadline, cancel)
+    best = None
+    stats = GenerationStats()
+    for attempt in range(tries):
+        dig_progress = None
+        if progress is not None:
+            def dig_progress(tried, total, done=attempt * 81):
+                progress(done + tried, tries * 81)
+        result = dig_puzzle(full_solution, None, budget, rng, dig_progress, cancel, difficulty, stats, limit)
+        if best is None or abs(result.rating.rating - difficulty) < abs(best.rating.rating - difficulty):
+            best = result
+        if result.rating.rating == difficulty or result.exhausted:
+            break  # hit the target, or the shared budget is spent
+        full_solution = generate_solved_grid(rng)
+    if progress is not None:
+        progress(tries * 81, tries * 81)
+    return best
+
+
+def generate_sudoku(puzzle, difficulty=5, budget=None, rng=random, progress=None, cancel=None):
+    """
+    Takes an incomplete puzzle (0 = empty), and a difficulty rating (1-10).
+    Returns (puzzle, stats): a new puzzle with numbers removed, while
+    preserving a unique solution, and the GenerationStats of making it.
+    `budget` is a DigBudget bounding the dig phase; see dig_puzzle for
+    `progress` and `cancel`.
+    """
+    result = generate_puzzle(puzzle, difficulty, budget, rng, progress, cancel)
+    return result.puzzle, result.stats
+
+
+def print_board(board):
+    size = len(board)
+    box = _box_of(size)
+    for i, row in enumerate(board):
+        row_str = ""
+        for j, num in enumerate(row):
+            char = DIGIT_CHARS[num]
+            row_str += char + " "
+            if (j + 1) % box == 0 and j < size - 1:
+                row_str += "| "
+        print(row_str)
+        if (i + 1) % box == 0 and i < size - 1:
+            print("-" * (2 * size + 2 * (box - 1) - 1))
+
+
+def _box_of(size):
+    """The box size of a grid with `size` rows."""
+    return round(size ** 0.5)
+
+
+def _random_permutation_of_groups(rng, box=3):
+    """A random permutation of the rows that only moves rows within their band and bands as a whole."""
+    bands = list(range(box))
+    rng.shuffle(bands)
+    order = []
+    for band in bands:
+        rows = list(range(band * box, band * box + box))
+        rng.shuffle(rows)
+        order.extend(rows)
+    return order
+
+
+def transform_grid(grid, rng=random):
+    """
+    Applies a random validity-preserving transformation to a grid of any
+    supported size: digit relabeling, row permutations within bands, band
+    permutation, column permutations within stacks, stack permutation and
+    transposition. Works for full grids and puzzles alike and returns a new
+    grid.
+    """
+    size = len(grid)
+    box = _box_of(size)
+    digits = list(range(1, size + 1))
+    rng.shuffle(digits)
+    relabel = [0] + digits # 0 (empty) stays empty
+    row_order = _random_permutation_of_groups(rng, box)
+    col_order = _random_permutation_of_groups(rng, box)
+    if rng.random() < 0.5:
+        return [[relabel[grid[r][c]] for r in row_order] for c in col_order]
+    return [[relabel[grid[r][c]] for c in col_order] for r in row_order]
+
+
+def generate_solved_grid(rng=random, method="fill", box=3):
+    """
+    Returns a random complete grid, 9x9 unless `box` asks for another size.
+    method="fill": fills random diagonal boxes and completes them with the
+    bitmask solver, trying the candidates of every branching cell in random
+    order. Any grid can come out.
+    method="pattern": randomly transforms a fixed base grid. About ten times
+    faster, but only reaches grids equivalent to the base pattern.
+    """
+    size = geometry(box).size
+    if method == "fill":
+        # The diagonal boxes share no row or column, so they can be
+        # filled independently; the solver then has far less left to do
+        board = [[0] * size for _ in range(size)]
+        for i in range(0, size, box):
+            nums = list(range(1, size + 1))
+            rng.shuffle(nums)
+            for r in range(box):
+                for c in range(box):
+                    board[i + r][i + c] = nums.pop()
+        grid = random_solution(board, rng)
+        return grid if grid else generate_solved_grid(rng, method, box)
+    if method == "pattern":
+        base = [[(r * box + r // box + c) % size + 1 for c in range(size)] for r in range(size)]
+        return transform_grid(base, rng)
+    raise ValueError(f"Unknown grid generation method {method!r}")
+
+
+def generate_random_start_board(rng=random, box=3):
+    """
+    Returns a random solved board to dig a puzzle out of with generate_sudoku.
+    This used to be a partially emptied board that generate_sudoku had to
+    solve again; a full grid is a valid start board and much cheaper to make.
+    """
+    return generate_solved_grid(rng, box=box)
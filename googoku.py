@@ -1,238 +1,32 @@
 import tkinter as tk
 from tkinter import font as tkFont
 from tkinter import messagebox
-import copy
-import random
+from tkinter import ttk
 import json # Keep this if you still want the save functionality in __main__
+import os
+import queue
+import threading
+import time
+from board import Board, BOX_SIZES, DIGIT_CHARS, board_values, find_conflicts
+from solver import SearchCancelled, SearchLimit, SearchLimitReached, SolverCache
+from notes import PencilNotes
+# The generator, the pool and the store are imported when they are first
+# needed, after the window is up (see _start_session)
 
-# --- Paste your Sudoku logic functions here ---
-# (is_valid, find_all_solutions, solve_and_check_unique,
-#  solve_first, generate_sudoku, print_board, generate_random_start_board)
-
-# <PASTE SUDOKU LOGIC HERE>
-def is_valid(board, row, col, num):
-    # Check row
-    if num in board[row]:
-        return False
-    # Check column
-    if num in [board[r][col] for r in range(9)]:
-        return False
-    # Check 3x3 box
-    box_row_start = (row // 3) * 3
-    box_col_start = (col // 3) * 3
-    for r in range(box_row_start, box_row_start + 3):
-        for c in range(box_col_start, box_col_start + 3):
-            if board[r][c] == num:
-                return False
-    return True
-
-def find_empty(board):
-    for r in range(9):
-        for c in range(9):
-            if board[r][c] == 0:
-                return (r, c)
-    return None
-
-def find_all_solutions(board, max_solutions=2):
-    solutions = []
-    
-    # Use a slightly different backtrack approach that might be less prone to deep recursion issues
-    # and explicitly finds empty cells
-    def backtrack_find(b):
-        nonlocal solutions
-        if len(solutions) >= max_solutions:
-            return True # Found enough solutions
-
-        find = find_empty(b)
-        if not find:
-            solutions.append(copy.deepcopy(b))
-            return len(solutions) >= max_solutions
-
-        row, col = find
-        for num in range(1, 10):
-            if is_valid(b, row, col, num):
-                b[row][col] = num
-                if backtrack_find(b):
-                    return True # Propagate stop signal
-                b[row][col] = 0 # Backtrack
-
-        return False # Did not find enough solutions from this path
-
-    # Create a copy to work on
-    board_copy = copy.deepcopy(board)
-    backtrack_find(board_copy)
-    return solutions
-
-
-def solve_and_check_unique(board):
-    solutions = find_all_solutions(board, max_solutions=2)
-    return len(solutions) == 1
-
-def solve_first(board):
-    solutions = find_all_solutions(board, max_solutions=1)
-    return solutions[0] if solutions else None
-
-def generate_sudoku(puzzle, effort=5):
-    """
-    Takes an incomplete puzzle (0 = empty), and an 'effort' level.
-    Returns a new puzzle with numbers removed, while preserving a unique solution.
-    Effort roughly corresponds to how many removal attempts are made per round.
-    Higher effort leads to potentially harder puzzles (more removed cells).
-    """
-    # Step 1: Ensure the input puzzle is solvable and get a full solution
-    full_solution = solve_first(puzzle)
-    if not full_solution:
-        # If the initial random board isn't solvable, try generating again
-        # This can happen, although less likely with the improved generator
-        print("Warning: Initial random board not solvable, regenerating...")
-        return generate_sudoku(generate_random_start_board(), effort)
-        # raise ValueError("Input puzzle is not solvable") # Or handle differently
-
-    working_puzzle = copy.deepcopy(full_solution)
-    
-    # Get all cell coordinates and shuffle them for random removal attempts
-    cells = [(r, c) for r in range(9) for c in range(9)]
-    random.shuffle(cells)
-    
-    cells_removed = 0
-    max_removals = 81 - 17 # Minimum number of clues for a unique solution is generally 17
-    
-    # Try removing cells one by one
-    for r, c in cells:
-        if working_puzzle[r][c] == 0: # Skip already empty cells
-            continue
-
-        removed_val = working_puzzle[r][c]
-        working_puzzle[r][c] = 0
-        
-        # Check if the puzzle still has a unique solution
-        if solve_and_check_unique(working_puzzle):
-             # Keep the cell removed
-             cells_removed += 1
-             if cells_removed >= max_removals : # Optional: Stop if too many cells removed
-                 break 
-        else:
-            # Restore the number if uniqueness is lost
-            working_puzzle[r][c] = removed_val
-
-    # The 'effort' parameter from the original code isn't directly used here.
-    # Instead, we use the number of successfully removed cells while maintaining uniqueness.
-    # The difficulty slider can map to this process indirectly if needed,
-    # perhaps by controlling the 'max_removals' or by applying post-processing.
-    # For now, the difficulty slider in the UI influences the *generation* effort.
-    # Let's adjust generate_sudoku slightly to use difficulty:
-    # Higher difficulty = try remove more cells (more potential iterations)
-
-    # Re-implementing with 'effort' idea more directly:
-    # Effort here will control the number of *passes* over random cells.
-    working_puzzle = copy.deepcopy(full_solution)
-    
-    # Adjust attempts based on difficulty (1-10)
-    # Scale the number of removal attempts based on difficulty.
-    # A simple scaling: total cells * difficulty / 10 * some factor
-    # Let's try roughly 'effort * 10' attempts.
-    
-    removal_attempts = effort * 15 # More attempts for higher difficulty
-    
-    
-    filled_cells = [(r, c) for r in range(9) for c in range(9) if working_puzzle[r][c] != 0]
-    random.shuffle(filled_cells)
-    
-    removed_count = 0
-    
-    # Try removing cells based on the shuffled list and effort
-    for r_idx in range(len(filled_cells)):
-        r, c = filled_cells[r_idx]
-        
-        # Limit removal attempts based on 'effort' scaling
-        if r_idx >= removal_attempts and effort < 10: # Allow max effort to try all
-             break 
-        
-        if working_puzzle[r][c] == 0: continue # Should not happen with this list, but safe check
-
-        removed_val = working_puzzle[r][c]
-        working_puzzle[r][c] = 0
-        
-        temp_solution_check = find_all_solutions(working_puzzle, max_solutions=2)
-
-        if len(temp_solution_check) == 1:
-             # Removal was successful, keep it removed
-             removed_count += 1
-        else:
-             # Removal resulted in non-unique or no solution, put it back
-             working_puzzle[r][c] = removed_val
-
-    print(f"Removed {removed_count} cells for difficulty {effort}.")
-    return working_puzzle
-
-
-def print_board(board):
-    # (Keep this for debugging if needed, but GUI will replace it)
-    for i, row in enumerate(board):
-        row_str = ""
-        for j, num in enumerate(row):
-            char = "." if num == 0 else str(num)
-            row_str += char + " "
-            if (j + 1) % 3 == 0 and j < 8:
-                row_str += "| "
-        print(row_str)
-        if (i + 1) % 3 == 0 and i < 8:
-            print("-" * 21)
-
-
-def generate_random_start_board():
-    # Generate a fully solved board first, then remove numbers.
-    # This is a more reliable way to get a valid starting point.
-    board = [[0 for _ in range(9)] for _ in range(9)]
-
-    # Fill the diagonal boxes first (guaranteed valid locally)
-    for i in range(0, 9, 3):
-        nums = list(range(1, 10))
-        random.shuffle(nums)
-        for r in range(3):
-            for c in range(3):
-                board[i+r][i+c] = nums.pop()
-
-    # Solve the rest of the board
-    full_board = solve_first(board)
-    if not full_board:
-        # Should be rare with the diagonal pre-fill, but handle recursion
-        print("Failed to create initial solved board, retrying...")
-        return generate_random_start_board()
-
-    # Now we have a fully solved board. We don't need to return this directly.
-    # We can immediately start removing elements based on some criteria,
-    # or just return this solvable state to `generate_sudoku`.
-    # The original `generate_random_start_board` seemed to aim for an *incomplete*
-    # but solvable board. Let's return the *solved* board, as `generate_sudoku`
-    # expects a complete board (or at least a solvable one) to start removing from.
-    # Edit: Let's return an *incomplete* but solvable board by removing some elements
-    # from the solved one randomly, ensuring it's still solvable.
-    
-    attempts = 40 # Try removing a fixed number of cells initially
-    temp_puzzle = copy.deepcopy(full_board)
-    removed_count = 0
-    cells = [(r,c) for r in range(9) for c in range(9)]
-    random.shuffle(cells)
-
-    for r, c in cells:
-        if removed_count >= attempts: break
-        
-        val = temp_puzzle[r][c]
-        temp_puzzle[r][c] = 0
-        
-        # Quick check if it's still solvable (doesn't need unique check here)
-        if solve_first(temp_puzzle):
-            removed_count += 1
-        else:
-            temp_puzzle[r][c] = val # Put back if it broke solvability
+# Ready puzzles are kept here between sessions
+POOL_FILE = os.path.join(os.path.expanduser("~"), ".googoku_pool.json")
 
-    # Return this partially filled, solvable board
-    # `generate_sudoku` will then remove more based on difficulty and uniqueness.
-    return temp_puzzle
+# Puzzle database the pool refills from; None for puzzle_store.DEFAULT_DB
+STORE_FILE = None
 
-# </PASTE SUDOKU LOGIC HERE>
+# Width and height of the grid in pixels, whatever its size
+GRID_PIXELS = 540
 
+# Longest the GUI searches for a solution it was not handed, in seconds
+SOLVE_TIME_LIMIT = 2.0
+
+# Solver results of the session, so checking an unchanged board again is instant
+SOLVER_CACHE = SolverCache(capacity=64)
 
 # --- Tkinter GUI Application ---
 
@@ -240,13 +34,9 @@ class SudokuGUI:
     def __init__(self, master):
         self.master = master
         master.title("Sudoku Solver")
-        master.geometry("600x750") # Adjusted size for controls
+        master.geometry("600x780") # Adjusted size for controls
 
         # --- Constants ---
-        self.cell_size = 60
-        self.grid_size = self.cell_size * 9
-        self.note_font_size = 10
-        self.value_font_size = 28
         self.color_bg = "#FFFFFF"
         self.color_grid = "#808080"
         self.color_block_grid = "#000000"
@@ -258,17 +48,31 @@ class SudokuGUI:
         self.color_valid = "#DDFFDD"     # Light green for success
 
         # --- Fonts ---
-        self.value_font = tkFont.Font(size=self.value_font_size, weight="bold")
-        self.note_font = tkFont.Font(size=self.note_font_size)
+        self.value_font = tkFont.Font(weight="bold")
+        # Fixed width, so the notes of a cell line up in columns
+        self.note_font = tkFont.Font(family=tkFont.nametofont("TkFixedFont").actual("family"))
 
         # --- Data Structures ---
+        self._set_grid_size(9)
         self.initial_board = [[0 for _ in range(9)] for _ in range(9)] # The generated puzzle
+        self.solution = None # Its unique solution, None while it is not known
         self.user_values = [[0 for _ in range(9)] for _ in range(9)]   # User's main entries
-        self.user_notes = [[set() for _ in range(9)] for _ in range(9)] # User's pencil marks
+        self.notes = PencilNotes(board_values(self.initial_board)) # User's pencil marks
 
         self.active_cell = None  # Tuple (row, col) or None
         self.highlighted_cells = set() # Set of (row, col) tuples for error highlighting
 
+        # Background generation: the worker thread reports through this queue,
+        # which the Tk main loop polls; setting the event cancels the job
+        self.generation_queue = None
+        self.generation_cancel = None
+        self.generation_difficulty = None # the difficulty the running generation aims for
+
+        # Puzzles generated ahead of time, so "New Puzzle" is usually instant;
+        # started by _start_session once the window is on screen
+        self.puzzle_pool = None
+        self.first_frame_time = None # time.perf_counter() when the window was first drawn
+
         # --- UI Elements ---
 
         # Frame for the grid
@@ -295,6 +99,13 @@ class SudokuGUI:
                                           length=150)
         self.difficulty_slider.pack(side=tk.LEFT)
 
+        # Grid size of the next puzzle
+        tk.Label(difficulty_frame, text="Size:").pack(side=tk.LEFT, padx=5)
+        self.box_var = tk.IntVar(value=3)
+        for box in BOX_SIZES:
+            tk.Radiobutton(difficulty_frame, text=f"{box * box}x{box * box}", variable=self.box_var,
+                           value=box).pack(side=tk.LEFT)
+
         # Input Mode Toggle (Radio Buttons)
         mode_frame = tk.Frame(self.control_frame)
         mode_frame.pack(pady=5)
@@ -304,6 +115,10 @@ class SudokuGUI:
         self.notes_radio = tk.Radiobutton(mode_frame, text="Pencil Notes", variable=self.mode_var, value="notes")
         self.value_radio.pack(side=tk.LEFT)
         self.notes_radio.pack(side=tk.LEFT, padx=10)
+        self.auto_notes_var = tk.BooleanVar(value=False)
+        self.auto_notes_check = tk.Checkbutton(mode_frame, text="Auto Candidates", variable=self.auto_notes_var,
+                                               command=self.toggle_auto_candidates)
+        self.auto_notes_check.pack(side=tk.LEFT)
 
         # Action Buttons Frame
         button_frame = tk.Frame(self.control_frame)
@@ -318,90 +133,154 @@ class SudokuGUI:
         self.restart_button = tk.Button(button_frame, text="Restart Puzzle", command=self.restart_current_puzzle, width=12)
         self.restart_button.pack(side=tk.LEFT, padx=5)
 
+        self.hint_button = tk.Button(button_frame, text="Hint", command=self.give_hint, width=8)
+        self.hint_button.pack(side=tk.LEFT, padx=5)
+
+        # Generation progress and cancel
+        progress_frame = tk.Frame(self.control_frame)
+        progress_frame.pack(pady=5)
+        self.progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=300,
+                                            mode="determinate", maximum=100)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(progress_frame, text="Cancel", command=self.cancel_generation,
+                                       width=8, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
         # Status Label
         self.status_var = tk.StringVar(value="Generate a new puzzle to start!")
         self.status_label = tk.Label(master, textvariable=self.status_var, relief=tk.SUNKEN, bd=1, anchor=tk.W)
+        self.color_status_bg = self.status_label.cget("bg")
         self.status_label.pack(side=tk.BOTTOM, fill=tk.X, ipady=2)
 
         # --- Bindings ---
         self.canvas.bind("<Button-1>", self._canvas_click)
         master.bind("<KeyPress>", self._key_press) # Bind to main window for global key capture
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
 
         # --- Initial Setup ---
         self._draw_grid_lines()
-        self.generate_new_puzzle() # Start with a puzzle
-
+        self._build_cell_items()
+        # Show the window first; the pool and the first puzzle load once the
+        # canvas has been drawn
+        self.canvas.bind("<Expose>", self._on_first_expose)
+
+    def _set_grid_size(self, size):
+        """Sizes cells and fonts so a grid of `size` x `size` cells fills the canvas."""
+        self.size = size
+        self.box = round(size ** 0.5)
+        self.cell_size = GRID_PIXELS // size
+        self.grid_size = self.cell_size * size
+        self.value_font.configure(size=max(8, self.cell_size * 28 // 60))
+        self.note_font.configure(size=max(5, self.cell_size * 30 // (60 * self.box)))
 
     def _draw_grid_lines(self):
         """Draws the Sudoku grid lines on the canvas."""
-        for i in range(10):
+        self.canvas.delete("grid")
+        self.canvas.configure(width=self.grid_size, height=self.grid_size)
+        box = self.box
+        for i in range(self.size + 1):
             # Determine line thickness
-            thickness = 3 if i % 3 == 0 else 1
-            color = self.color_block_grid if i % 3 == 0 else self.color_grid
+            thickness = 3 if i % box == 0 else 1
+            color = self.color_block_grid if i % box == 0 else self.color_grid
 
             # Vertical lines
             x = i * self.cell_size
-            self.canvas.create_line(x, 0, x, self.grid_size, fill=color, width=thickness)
+            self.canvas.create_line(x, 0, x, self.grid_size, fill=color, width=thickness, tags="grid")
 
             # Horizontal lines
             y = i * self.cell_size
-            self.canvas.create_line(0, y, self.grid_size, y, fill=color, width=thickness)
+            self.canvas.create_line(0, y, self.grid_size, y, fill=color, width=thickness, tags="grid")
+
+    # --- Rendering ---
+    #
+    # Every cell has three canvas items, created once per grid size: its
+    # background, its value and its notes (one text item, the notes in lines
+    # of `box`). Whatever changes a cell's look marks it in dirty_cells;
+    # _redraw then reconfigures the items of the dirty cells, and of those
+    # only what differs from the look they were last drawn with.
+
+    def _build_cell_items(self):
+        """Creates the canvas items of every cell for the current grid size."""
+        self.canvas.delete("cell")
+        cs = self.cell_size
+        self.cell_items = {}
+        for r in range(self.size):
+            for c in range(self.size):
+                x0 = c * cs
+                y0 = r * cs
+                background = self.canvas.create_rectangle(x0, y0, x0 + cs, y0 + cs, fill=self.color_bg,
+                                                          outline="", tags="cell")
+                value = self.canvas.create_text(x0 + cs / 2, y0 + cs / 2, text="", font=self.value_font,
+                                                tags="cell")
+                notes = self.canvas.create_text(x0 + cs / 2, y0 + cs / 2, text="", font=self.note_font,
+                                                fill=self.color_note_text, justify=tk.LEFT, tags="cell")
+                self.cell_items[r, c] = (background, value, notes)
+        self.canvas.tag_raise("grid")
+        self.cell_looks = {}
+        self.dirty_cells = set(self.cell_items)
+
+    def _cell_look(self, r, c):
+        """(background color, value text, value color, notes text) of a cell."""
+        if (r, c) in self.highlighted_cells:
+            background = self.color_highlight
+        elif self.active_cell == (r, c):
+            background = self.color_active_cell
+        else:
+            background = self.color_bg
+        if self.initial_board[r][c] != 0:
+            return background, DIGIT_CHARS[self.initial_board[r][c]], self.color_fixed_text, ""
+        if self.user_values[r][c] != 0:
+            return background, DIGIT_CHARS[self.user_values[r][c]], self.color_user_text, ""
+        notes = [DIGIT_CHARS[num] for num in self.notes.digits(r * self.size + c)]
+        lines = (" ".join(notes[i:i + self.box]) for i in range(0, len(notes), self.box))
+        return background, "", self.color_user_text, "\n".join(lines)
+
+    def _redraw(self):
+        """Brings the canvas items of the dirty cells up to date."""
+        canvas = self.canvas
+        for cell in self.dirty_cells:
+            look = self._cell_look(*cell)
+            old = self.cell_looks.get(cell)
+            if look == old:
+                continue
+            background, value, notes = self.cell_items[cell]
+            if old is None or look[0] != old[0]:
+                canvas.itemconfigure(background, fill=look[0])
+            if old is None or look[1:3] != old[1:3]:
+                canvas.itemconfigure(value, text=look[1], fill=look[2])
+            if old is None or look[3] != old[3]:
+                canvas.itemconfigure(notes, text=look[3])
+            self.cell_looks[cell] = look
+        self.dirty_cells.clear()
 
     def _draw_all_cells(self):
-        """Redraws the contents of all cells based on current state."""
-        self.canvas.delete("numbers")  # Clear previous numbers
-        self.canvas.delete("notes")    # Clear previous notes
-        self.canvas.delete("highlight")  # Clear previous highlights
-        self.canvas.delete("active_highlight")  # Clear active highlight
-
-        for r in range(9):
-            for c in range(9):
-                x0 = c * self.cell_size
-                y0 = r * self.cell_size
-                x_center = x0 + self.cell_size / 2
-                y_center = y0 + self.cell_size / 2
-
-                # Draw background highlight if needed
-                if (r, c) in self.highlighted_cells:
-                    self.canvas.create_rectangle(x0, y0, x0 + self.cell_size, y0 + self.cell_size,
-                                                 fill=self.color_highlight, outline="", tags="highlight")
-                elif self.active_cell == (r, c):
-                    self.canvas.create_rectangle(x0, y0, x0 + self.cell_size, y0 + self.cell_size,
-                                                 fill=self.color_active_cell, outline="", tags="active_highlight")
-
-                # Draw initial puzzle numbers (fixed)
-                if self.initial_board[r][c] != 0:
-                    self.canvas.create_text(x_center, y_center,
-                                            text=str(self.initial_board[r][c]),
-                                            font=self.value_font,
-                                            fill=self.color_fixed_text,
-                                            tags="numbers")
-                # Draw user-entered values
-                elif self.user_values[r][c] != 0:
-                    self.canvas.create_text(x_center, y_center,
-                                            text=str(self.user_values[r][c]),
-                                            font=self.value_font,
-                                            fill=self.color_user_text,
-                                            tags="numbers")
-                # Draw user notes (if no value is entered)
-                elif self.user_notes[r][c]:
-                    notes = sorted(list(self.user_notes[r][c]))
-                    note_str = "".join(map(str, notes))
-
-                    # Simple grid layout for notes within the cell
-                    rows_cols = 3 # Arrange notes in a 3x3 grid within the cell
-                    for i, note_num in enumerate(notes):
-                        note_r = i // rows_cols
-                        note_c = i % rows_cols
-                        # Calculate position within the cell (adjust offsets as needed)
-                        note_x = x0 + (note_c + 0.5) * (self.cell_size / rows_cols)
-                        note_y = y0 + (note_r + 0.5) * (self.cell_size / rows_cols)
-
-                        self.canvas.create_text(note_x, note_y,
-                                                text=str(note_num),
-                                                font=self.note_font,
-                                                fill=self.color_note_text,
-                                                tags="notes")
+        """Redraws every cell whose look changed, e.g. after a new puzzle."""
+        self.dirty_cells.update(self.cell_items)
+        self._redraw()
+
+    def _set_active_cell(self, cell):
+        if self.active_cell is not None:
+            self.dirty_cells.add(self.active_cell)
+        self.active_cell = cell
+        if cell is not None:
+            self.dirty_cells.add(cell)
+
+    def _set_highlights(self, cells):
+        self.dirty_cells |= self.highlighted_cells
+        self.highlighted_cells = set(cells)
+        self.dirty_cells |= self.highlighted_cells
+
+    # --- Values and notes ---
+
+    def _new_notes(self):
+        """Starts empty notes (the candidates, in auto mode) for the current puzzle."""
+        self.notes = PencilNotes(board_values(self.initial_board), self.auto_notes_var.get())
+
+    def _set_value(self, r, c, num):
+        """Sets the user value of a cell, 0 to erase it, and updates the notes of its peers."""
+        self.user_values[r][c] = num
+        self.dirty_cells.add((r, c))
+        self.dirty_cells.update(divmod(peer, self.size) for peer in self.notes.place(r * self.size + c, num))
 
     def _canvas_click(self, event):
         """Handles clicking on the canvas to select a cell."""
@@ -412,32 +291,36 @@ class SudokuGUI:
 
             # Check if the clicked cell is a pre-filled number
             if self.initial_board[row][col] != 0:
-                self.active_cell = None  # Cannot select pre-filled cells
-                self.highlighted_cells = {(r, c) for r in range(9) for c in range(9)
-                                           if self.initial_board[r][c] == self.initial_board[row][col] or
-                                           self.user_values[r][c] == self.initial_board[row][col]}
-                self.status_var.set(f"Highlighted all cells with value {self.initial_board[row][col]}.")
+                self._set_active_cell(None)  # Cannot select pre-filled cells
+                self._set_highlights((r, c) for r in range(self.size) for c in range(self.size)
+                                     if self.initial_board[r][c] == self.initial_board[row][col] or
+                                     self.user_values[r][c] == self.initial_board[row][col])
+                self.status_var.set(f"Highlighted all cells with value {DIGIT_CHARS[self.initial_board[row][col]]}.")
             else:
                 # Handle user-modifiable cells
                 if self.initial_board[row][col] == 0:
-                    self.active_cell = (row, col)
+                    self._set_active_cell((row, col))
                     self.status_var.set(f"Selected cell ({row+1}, {col+1}). Enter number or notes.")
                 else:
-                    self.active_cell = None
+                    self._set_active_cell(None)
                     self.status_var.set("Cannot modify initial puzzle numbers.")
 
-                self.highlighted_cells.clear()  # Clear highlights for user-modifiable cells
+                self._set_highlights(())  # Clear highlights for user-modifiable cells
 
-            self._draw_all_cells()  # Redraw to show highlights or active cell
+            self._redraw()  # Redraw to show highlights or active cell
 
     def _key_press(self, event):
         """Handles number key presses and mode switching."""
         key = event.keysym
         # print(f"Key pressed: {key}") # Optional: for debugging
+        # Digits above 9 are typed as letters, A for 10; on 25x25 that includes 'm'
+        num = DIGIT_CHARS.find(key.upper()) if len(key) == 1 else -1
+        if not 1 <= num <= self.size:
+            num = None
 
         # --- Handle Mode Toggle Key (e.g., 'm') ---
         # We check this *before* checking for active_cell, so mode can be switched anytime
-        if key.lower() == 'm': # Use 'm' or 'M' to toggle mode
+        if key.lower() == 'm' and num is None: # Use 'm' or 'M' to toggle mode
             current_mode = self.mode_var.get()
             if current_mode == "value":
                 new_mode = "notes"
@@ -460,41 +343,37 @@ class SudokuGUI:
 
         r, c = self.active_cell
 
-        # --- Handle Number Input (1-9) ---
-        if key.isdigit() and '1' <= key <= '9':
-            num = int(key)
+        # --- Handle Number Input (1-9, then letters) ---
+        if num is not None:
             mode = self.mode_var.get()
+            char = DIGIT_CHARS[num]
 
             if mode == "value":
                 # Enter the final value
                 if self.user_values[r][c] != num: # Only redraw if changed
-                    self.user_values[r][c] = num
-                    self.user_notes[r][c] = set() # Clear notes when value is set
-                    self.status_var.set(f"Entered value {num} in cell ({r+1}, {c+1})")
+                    self._set_value(r, c, num) # Also clears its notes, and the number from its peers' notes
+                    self.status_var.set(f"Entered value {char} in cell ({r+1}, {c+1})")
                     self._clear_highlights() # Clear previous validity highlights
-                    self._draw_all_cells() # Redraw needed
+                    self._redraw() # Redraw needed
                 else:
-                     self.status_var.set(f"Cell ({r+1}, {c+1}) already has value {num}")
+                     self.status_var.set(f"Cell ({r+1}, {c+1}) already has value {char}")
 
 
             elif mode == "notes":
                 # Add or remove the number from notes
                 if self.user_values[r][c] == 0: # Can only add notes if no final value
-                    notes_changed = False
-                    if num in self.user_notes[r][c]:
-                        self.user_notes[r][c].remove(num)
-                        self.status_var.set(f"Removed note {num} from cell ({r+1}, {c+1})")
-                        notes_changed = True
+                    notes_changed = True
+                    if self.notes.toggle(r * self.size + c, num):
+                        self.status_var.set(f"Added note {char} to cell ({r+1}, {c+1})")
                     else:
-                        self.user_notes[r][c].add(num)
-                        self.status_var.set(f"Added note {num} to cell ({r+1}, {c+1})")
-                        notes_changed = True
+                        self.status_var.set(f"Removed note {char} from cell ({r+1}, {c+1})")
 
                     if notes_changed:
+                        self.dirty_cells.add((r, c))
                         self._clear_highlights()
-                        self._draw_all_cells() # Redraw needed
+                        self._redraw() # Redraw needed
                 else:
-                    self.status_var.set(f"Cannot add notes, cell ({r+1}, {c+1}) has value {self.user_values[r][c]}")
+                    self.status_var.set(f"Cannot add notes, cell ({r+1}, {c+1}) has value {DIGIT_CHARS[self.user_values[r][c]]}")
 
 
         # --- Handle Deletion (Backspace/Delete) ---
@@ -502,25 +381,27 @@ class SudokuGUI:
             cleared_something = False
             # Clear value primarily. If no value, clear notes.
             if self.user_values[r][c] != 0:
-                self.user_values[r][c] = 0
+                self._set_value(r, c, 0)
                 self.status_var.set(f"Cleared value from cell ({r+1}, {c+1})")
                 cleared_something = True
-            elif self.user_notes[r][c]:
-                 self.user_notes[r][c] = set() # Clear all notes if no value
+            elif self.notes.masks[r * self.size + c]:
+                 self.notes.clear(r * self.size + c) # Clear all notes if no value
                  self.status_var.set(f"Cleared notes from cell ({r+1}, {c+1})")
                  cleared_something = True
 
             if cleared_something:
+                self.dirty_cells.add((r, c))
                 self._clear_highlights()
-                self._draw_all_cells() # Redraw needed
+                self._redraw() # Redraw needed
 
         # --- Handle Arrow Keys for Navigation ---
         elif key in ("Up", "Down", "Left", "Right"):
             nr, nc = r, c
+            last = self.size - 1
             if key == "Up":    nr = max(0, r - 1)
-            elif key == "Down":  nr = min(8, r + 1)
+            elif key == "Down":  nr = min(last, r + 1)
             elif key == "Left":  nc = max(0, c - 1)
-            elif key == "Right": nc = min(8, c + 1)
+            elif key == "Right": nc = min(last, c + 1)
 
             original_nr, original_nc = nr, nc # Store initial target
 
@@ -530,9 +411,9 @@ class SudokuGUI:
             while self.initial_board[nr][nc] != 0 and (nr, nc) not in visited_while_skipping:
                  visited_while_skipping.add((nr, nc))
                  if key == "Up":    nr = max(0, nr - 1)
-                 elif key == "Down":  nr = min(8, nr + 1)
+                 elif key == "Down":  nr = min(last, nr + 1)
                  elif key == "Left":  nc = max(0, nc - 1)
-                 elif key == "Right": nc = min(8, nc + 1)
+                 elif key == "Right": nc = min(last, nc + 1)
                  # Break if we wrapped around or hit the original again
                  if (nr, nc) in visited_while_skipping:
                      nr, nc = r, c # Stay in the original cell if no valid move found
@@ -540,106 +421,237 @@ class SudokuGUI:
 
             # Only move if the target cell is different and empty
             if (nr, nc) != (r, c) and self.initial_board[nr][nc] == 0:
-                self.active_cell = (nr, nc)
+                self._set_active_cell((nr, nc))
                 self.status_var.set(f"Moved to cell ({nr+1}, {nc+1})")
                 self._clear_highlights()
-                self._draw_all_cells() # Redraw needed for active cell highlight change
+                self._redraw() # Redraw needed for active cell highlight change
             elif (nr, nc) == (r,c):
                  self.status_var.set(f"Cannot move {key} from cell ({r+1}, {c+1}). Blocked or edge.")
 
 
     def _clear_highlights(self):
         """Removes any validity highlighting."""
-        self.highlighted_cells.clear()
+        self._set_highlights(())
         self.canvas.configure(bg=self.color_bg) # Reset canvas bg just in case
-        self.status_label.configure(bg='SystemButtonFace', fg='black') # Reset status bar colors
+        self.status_label.configure(bg=self.color_status_bg, fg='black') # Reset status bar colors
 
     def _get_current_board_state(self):
-        """Combines initial board and user values into one board."""
-        current_board = copy.deepcopy(self.initial_board)
-        for r in range(9):
-            for c in range(9):
+        """Combines initial board and user values into one Board."""
+        current_board = Board.from_rows(self.initial_board)
+        for r in range(self.size):
+            for c in range(self.size):
                 if self.user_values[r][c] != 0:
                     # Ensure user value doesn't conflict with initial board (shouldn't happen with UI logic)
-                    if current_board[r][c] == 0:
-                        current_board[r][c] = self.user_values[r][c]
-                    elif current_board[r][c] != self.user_values[r][c]:
+                    if current_board[r, c] == 0:
+                        current_board[r, c] = self.user_values[r][c]
+                    elif current_board[r, c] != self.user_values[r][c]:
                          # This indicates a logic error or data corruption
-                         print(f"ERROR: Conflict at ({r},{c}). Initial={current_board[r][c]}, User={self.user_values[r][c]}")
+                         print(f"ERROR: Conflict at ({r},{c}). Initial={current_board[r, c]}, User={self.user_values[r][c]}")
                          # Handle error appropriately, maybe highlight the conflict
-                         self.highlighted_cells.add((r,c))
+                         self._set_highlights(self.highlighted_cells | {(r, c)})
 
 
         return current_board
 
+    # --- Startup ---
+
+    def _on_first_expose(self, event):
+        """Runs the rest of the startup once the canvas has been drawn for the first time."""
+        self.canvas.unbind("<Expose>")
+        # Tk handles the expose itself before this binding, so its redraw is
+        # already queued and runs before this idle callback
+        self.master.after_idle(self._start_session)
+
+    def _start_session(self):
+        """Starts the puzzle pool (loading the puzzle modules with it) and shows the first puzzle."""
+        from puzzle_pool import PuzzlePool
+        from puzzle_store import DEFAULT_DB
+        self.first_frame_time = time.perf_counter()
+        self.puzzle_pool = PuzzlePool(store_path=STORE_FILE or DEFAULT_DB)
+        self.puzzle_pool.load(POOL_FILE)
+        self.puzzle_pool.start()
+        self.generate_new_puzzle() # Start with a puzzle
+
     # --- Button Actions ---
 
     def generate_new_puzzle(self):
-        """Generates a new Sudoku puzzle based on selected difficulty."""
+        """Starts generating a new puzzle of the selected difficulty in a background thread."""
+        if self.generation_queue is not None:
+            return # A puzzle is already being generated
         self._clear_highlights()
-        self.active_cell = None
         difficulty = self.difficulty_var.get()
-        self.status_var.set(f"Generating new puzzle (difficulty {difficulty})...")
-        self.master.update_idletasks() # Update UI to show status message
+        box = self.box_var.get()
+
+        # Serve a ready puzzle from the pool if there is one (the pool only keeps 9x9 puzzles)
+        entry = self.puzzle_pool.take(difficulty) if box == 3 and self.puzzle_pool is not None else None
+        if entry is not None:
+            puzzle, solution, rating = entry
+            self._show_new_puzzle(puzzle, rating, solution, difficulty)
+            return
 
+        self.status_var.set(f"Generating new {box * box}x{box * box} puzzle (difficulty {difficulty})...")
+        self.new_puzzle_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.progress_bar["value"] = 0
+
+        self.generation_queue = queue.Queue()
+        self.generation_cancel = threading.Event()
+        self.generation_difficulty = difficulty
+        worker = threading.Thread(target=self._generation_worker,
+                                  args=(difficulty, box, self.generation_queue, self.generation_cancel),
+                                  daemon=True)
+        worker.start()
+        self.master.after(50, self._poll_generation)
+
+    @staticmethod
+    def _generation_worker(difficulty, box, results, cancel):
+        """Runs in the worker thread; must not touch any Tk widget."""
         try:
+            from generator import generate_puzzle, generate_random_start_board
             # Generate a solvable base board
-            start_board = generate_random_start_board()
-            # Remove numbers based on difficulty, ensuring unique solution
-            self.initial_board = generate_sudoku(start_board, difficulty)
-
-            # Reset user inputs
-            self.user_values = [[0 for _ in range(9)] for _ in range(9)]
-            self.user_notes = [[set() for _ in range(9)] for _ in range(9)]
+            start_board = generate_random_start_board(box=box)
+            # Dig a unique puzzle rated as close to the difficulty as possible
+            # (other sizes than 9x9 have no rating and come back with None)
+            result = generate_puzzle(start_board, difficulty,
+                                     progress=lambda tried, total: results.put(("progress", tried / total)),
+                                     cancel=cancel)
+            results.put(("done", result))
+        except SearchCancelled:
+            results.put(("cancelled", None))
+        except Exception as e:
+            results.put(("error", e))
 
-            self.status_var.set(f"New puzzle (difficulty {difficulty}) generated. Good luck!")
-            self._draw_all_cells()
+    def _poll_generation(self):
+        """Picks up progress and results from the generation worker on the Tk main thread."""
+        results = self.generation_queue
+        if results is None:
+            return
+        try:
+            while True:
+                kind, payload = results.get_nowait()
+                if kind == "progress":
+                    self.progress_bar["value"] = payload * 100
+                else:
+                    self._finish_generation(kind, payload)
+                    return
+        except queue.Empty:
+            pass
+        self.master.after(50, self._poll_generation)
+
+    def _finish_generation(self, kind, payload):
+        self.generation_queue = None
+        self.generation_cancel = None
+        self.new_puzzle_button.configure(state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.DISABLED)
+        if kind == "done":
+            self._show_new_puzzle(payload.puzzle, payload.rating.rating if payload.rating else None,
+                                  payload.solution, self.generation_difficulty)
+
+        elif kind == "cancelled":
+            self.progress_bar["value"] = 0
+            self.status_var.set("Puzzle generation cancelled.")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate puzzle:\n{e}")
+        else:
+            messagebox.showerror("Error", f"Failed to generate puzzle:\n{payload}")
             self.status_var.set("Error generating puzzle. Try again.")
             # Optionally reset to a blank or previous state
-            self.initial_board = [[0 for _ in range(9)] for _ in range(9)]
-            self.user_values = [[0 for _ in range(9)] for _ in range(9)]
-            self.user_notes = [[set() for _ in range(9)] for _ in range(9)]
+            self.initial_board = [[0 for _ in range(self.size)] for _ in range(self.size)]
+            self.solution = None
+            self.user_values = [[0 for _ in range(self.size)] for _ in range(self.size)]
+            self._new_notes()
             self._draw_all_cells()
 
+    def _show_new_puzzle(self, puzzle, difficulty, solution, requested=None):
+        """
+        Shows `puzzle`; `difficulty` is its rating, None for unrated sizes.
+        `solution` is its unique solution, which the generator and the pool
+        always know, so nothing is solved on the Tk main thread here.
+        `requested` is the difficulty that was asked for: rare ratings come
+        back as the closest one, and the status says so.
+        """
+        size = len(puzzle)
+        if size != self.size:
+            self._set_grid_size(size)
+            self._draw_grid_lines()
+            self._build_cell_items()
+        self.initial_board = puzzle
+        self.solution = solution
+        self.active_cell = None
+        # Reset user inputs
+        self.user_values = [[0 for _ in range(size)] for _ in range(size)]
+        self._new_notes()
+        self.progress_bar["value"] = 100
+        if difficulty is None:
+            self.status_var.set(f"New {size}x{size} puzzle generated. Good luck!")
+        elif requested is not None and requested != difficulty:
+            self.status_var.set(f"New puzzle (difficulty {difficulty}, the closest to {requested} found) generated. "
+                                "Good luck!")
+        else:
+            self.status_var.set(f"New puzzle (difficulty {difficulty}) generated. Good luck!")
+        self._draw_all_cells()
+
+    def cancel_generation(self):
+        """Asks the generation worker to stop; it reports back through _poll_generation."""
+        if self.generation_cancel is not None:
+            self.generation_cancel.set()
+            self.cancel_button.configure(state=tk.DISABLED)
+            self.status_var.set("Cancelling puzzle generation...")
+
+    @staticmethod
+    def _solve_bounded(board, max_solutions):
+        """Up to `max_solutions` solutions of `board`, or None if SOLVE_TIME_LIMIT runs out first."""
+        limit = SearchLimit(deadline=time.monotonic() + SOLVE_TIME_LIMIT)
+        try:
+            return SOLVER_CACHE.find_all_solutions(board, max_solutions, limit=limit)
+        except SearchLimitReached:
+            return None
+
+    def _wrong_entries(self):
+        """The cells whose user value differs from the known solution."""
+        return {(r, c) for r in range(self.size) for c in range(self.size)
+                if self.user_values[r][c] and self.user_values[r][c] != self.solution[r][c]}
+
     def check_current_validity(self):
         """Checks if the current user entries violate Sudoku rules or if the board is unsolvable."""
         self._clear_highlights()
-        current_board = self._get_current_board_state()
-        has_illegal_entry = False
+        board = self._get_current_board_state()
         is_unsolvable = False
+        is_undecided = False
+        wrong_entries = set()
+
+        # Every cell whose number repeats in its row, column or box
+        conflicts = find_conflicts(board)
+        self._set_highlights(self.highlighted_cells | {divmod(cell, self.size) for cell in conflicts})
+        has_illegal_entry = bool(conflicts)
 
-        for r in range(9):
-            for c in range(9):
-                num = current_board[r][c]
-                if num != 0:
-                    # Temporarily set cell to 0 to check validity against others
-                    current_board[r][c] = 0
-                    if not is_valid(current_board, r, c, num):
-                        self.highlighted_cells.add((r, c))
-                        has_illegal_entry = True
-                    # Restore the number
-                    current_board[r][c] = num
-
-        # Check if the board is solvable
+        # Check if the board is solvable: the puzzle has one solution, so
+        # every entry that differs from it is a wrong one
         if not has_illegal_entry:
-            solved_board = solve_first(current_board)
-            if not solved_board:
-                is_unsolvable = True
+            if self.solution is not None:
+                wrong_entries = self._wrong_entries()
+                self._set_highlights(self.highlighted_cells | wrong_entries)
+            else:
+                solutions = self._solve_bounded(board, 1)
+                is_undecided = solutions is None
+                is_unsolvable = solutions == []
 
-        self._draw_all_cells()  # Redraw to show highlights
+        self._redraw()  # Redraw to show highlights
 
         if has_illegal_entry:
             self.status_var.set("Board contains illegal entries (marked in red).")
             self.status_label.configure(bg=self.color_highlight, fg='black')
+        elif wrong_entries:
+            count = len(wrong_entries)
+            self.status_var.set(f"{count} {'entry does' if count == 1 else 'entries do'} not match the solution (marked in red).")
+            self.status_label.configure(bg=self.color_highlight, fg='black')
+        elif is_undecided:
+            self.status_var.set(f"Entries are legal, but solving took longer than {SOLVE_TIME_LIMIT:g} seconds.")
         elif is_unsolvable:
             self.status_var.set("Board is valid but not solvable.")
             self.status_label.configure(bg=self.color_highlight, fg='black')
         else:
             # Check if board is full
-            is_full = all(current_board[r][c] != 0 for r in range(9) for c in range(9))
+            is_full = board.clue_count() == self.size * self.size
             if is_full:
                 self.status_var.set("Board is full and valid according to rules!")
                 self.status_label.configure(bg=self.color_valid, fg='black')
@@ -648,6 +660,50 @@ class SudokuGUI:
                 self.status_label.configure(bg=self.color_valid, fg='black')
 
 
+    def give_hint(self):
+        """
+        Fills in one cell from the solution: the active cell if it is empty or
+        wrong, else the first wrong entry, else the first empty cell.
+        """
+        if not any(any(row) for row in self.initial_board): # No puzzle loaded
+            self.status_var.set("Generate a puzzle first.")
+            return
+        solution = self.solution
+        if solution is None:
+            # Any solution that keeps the current entries will do
+            solutions = self._solve_bounded(self._get_current_board_state(), 1)
+            if not solutions:
+                self.status_var.set("No hint: the current entries cannot be completed." if solutions == []
+                                    else f"No hint: solving took longer than {SOLVE_TIME_LIMIT:g} seconds.")
+                return
+            solution = solutions[0]
+
+        open_cells = [(r, c) for r in range(self.size) for c in range(self.size)
+                      if self.user_values[r][c] != solution[r][c] and not self.initial_board[r][c]]
+        if not open_cells:
+            self.status_var.set("Nothing to hint, the board is solved.")
+            return
+        if self.active_cell in open_cells:
+            r, c = self.active_cell
+        else:
+            r, c = next((cell for cell in open_cells if self.user_values[cell[0]][cell[1]]), open_cells[0])
+
+        self._set_value(r, c, solution[r][c])
+        self._set_active_cell((r, c))
+        self._clear_highlights()
+        self.status_var.set(f"Hint: cell ({r+1}, {c+1}) is {DIGIT_CHARS[solution[r][c]]}.")
+        self._redraw()
+
+    def toggle_auto_candidates(self):
+        """Switches the notes between the candidates of every cell and notes entered by hand."""
+        auto = self.auto_notes_var.get()
+        self.notes.set_auto(auto)
+        if auto:
+            self.status_var.set("Notes show the candidates of every cell and follow your entries.")
+        else:
+            self.status_var.set("Notes are entered by hand again; values still remove them from peer cells.")
+        self._draw_all_cells()
+
     def restart_current_puzzle(self):
         """Clears user inputs and resets to the initial state of the current puzzle."""
         if not any(any(row) for row in self.initial_board): # No puzzle loaded
@@ -658,11 +714,23 @@ class SudokuGUI:
         if confirm:
             self._clear_highlights()
             self.active_cell = None
-            self.user_values = [[0 for _ in range(9)] for _ in range(9)]
-            self.user_notes = [[set() for _ in range(9)] for _ in range(9)]
+            self.user_values = [[0 for _ in range(self.size)] for _ in range(self.size)]
+            self._new_notes()
             self.status_var.set("Puzzle restarted. Showing initial board.")
             self._draw_all_cells()
 
+    def _on_close(self):
+        """Stops background work and keeps the ready puzzles for the next start."""
+        if self.generation_cancel is not None:
+            self.generation_cancel.set()
+        if self.puzzle_pool is not None:
+            self.puzzle_pool.stop()
+            try:
+                self.puzzle_pool.save(POOL_FILE)
+            except OSError as e:
+                print(f"Error saving puzzle pool: {e}")
+        self.master.destroy()
+
 
 # --- Main Execution ---
 if __name__ == "__main__":
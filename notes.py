@@ -0,0 +1,109 @@
+"""Pencil notes as digit bitmasks, with optional automatic candidates.
+
+PencilNotes keeps one mask per cell, bit d - 1 standing for digit d, next to
+the values of all cells (clues and entries alike). For every row, column and
+box it counts how often each digit is placed there, and keeps the mask of
+the digits placed at least once, so the digits a unit already uses are known
+without looking at its cells. Counts rather than plain bits, because a
+player may well enter the same digit twice in a unit.
+
+Placing a value clears that digit from the notes of the cell's peers. With
+`auto` on, the notes of every empty cell start out as its candidates (the
+digits none of its peers holds), and erasing a value gives it back to the
+peers where it is a candidate again. Either way a value only touches the cell
+and its peers, 20 cells on 9x9, however many cells the grid has.
+"""
+from board import geometry_of
+
+
+class PencilNotes:
+    """
+    Notes and cell values of one grid. `values` are the clues, as flat cell
+    values with 0 for empty cells.
+    """
+
+    __slots__ = ("geometry", "all_digits", "values", "masks", "counts", "used", "auto")
+
+    def __init__(self, values, auto=False):
+        geo = geometry_of(len(values))
+        self.geometry = geo
+        self.all_digits = (1 << geo.size) - 1
+        self.values = [0] * geo.cells
+        self.masks = [0] * geo.cells
+        self.counts = [[0] * (geo.size + 1) for _ in geo.units]
+        self.used = [0] * len(geo.units)
+        self.auto = False
+        for cell, value in enumerate(values):
+            if value:
+                self.place(cell, value)
+        self.set_auto(auto)
+
+    def candidates(self, cell):
+        """Mask of the digits none of the peers of an empty `cell` holds; 0 for a filled one."""
+        if self.values[cell]:
+            return 0
+        used = self.used
+        row, col, box = self.geometry.cell_units[cell]
+        return self.all_digits & ~(used[row] | used[col] | used[box])
+
+    def digits(self, cell):
+        """The noted digits of `cell`, in ascending order."""
+        mask = self.masks[cell]
+        return [digit for digit in range(1, self.geometry.size + 1) if mask >> (digit - 1) & 1]
+
+    def _count(self, cell, value, step):
+        bit = 1 << (value - 1)
+        for unit in self.geometry.cell_units[cell]:
+            counts = self.counts[unit]
+            counts[value] += step
+            if counts[value]:
+                self.used[unit] |= bit
+            else:
+                self.used[unit] &= ~bit
+
+    def place(self, cell, value):
+        """
+        Sets the value of `cell`, 0 to erase it, and returns the peers whose
+        notes changed. A filled cell has no notes; an erased one gets its
+        candidates with auto on.
+        """
+        old = self.values[cell]
+        if value == old:
+            return []
+        if old:
+            self._count(cell, old, -1)
+        self.values[cell] = value
+        if value:
+            self._count(cell, value, 1)
+        masks = self.masks
+        masks[cell] = self.candidates(cell) if self.auto else 0
+
+        keep = ~(1 << (value - 1)) if value else -1
+        restore = 1 << (old - 1) if old and self.auto else 0
+        changed = []
+        for peer in self.geometry.peers[cell]:
+            mask = masks[peer] & keep
+            if restore:
+                mask |= self.candidates(peer) & restore
+            if mask != masks[peer]:
+                masks[peer] = mask
+                changed.append(peer)
+        return changed
+
+    def toggle(self, cell, digit):
+        """Adds `digit` to the notes of `cell` or takes it out; returns whether it is noted now."""
+        bit = 1 << (digit - 1)
+        self.masks[cell] ^= bit
+        return bool(self.masks[cell] & bit)
+
+    def clear(self, cell):
+        self.masks[cell] = 0
+
+    def set_auto(self, auto):
+        """
+        Turns automatic candidates on, which replaces all notes by the
+        candidates of each cell, or off, which keeps the notes as they are.
+        """
+        self.auto = auto
+        if auto:
+            self.masks = [self.candidates(cell) for cell in range(self.geometry.cells)]
@@ -0,0 +1,172 @@
+"""A pool of ready-made puzzles per difficulty, refilled in the background.
+
+PuzzlePool keeps up to `size` generated puzzles for every difficulty level so
+that a new puzzle can be handed out immediately. Whenever a level drops below
+`low_watermark` a worker thread generates puzzles for it until it is full
+again. The pool can be saved to and loaded from a JSON file, so a restarted
+application has puzzles ready right away.
+
+Difficulty levels are target ratings (see rater.py). Some ratings are rare,
+so like generate_puzzle the pool settles for the closest rating it reached,
+and every puzzle is kept with the rating it actually got.
+
+With a `store_path`, the worker first refills from that puzzle_store.py
+database, taking puzzles that were never handed out, and only generates when
+the store has none left for the level. Generated puzzles are added to the
+store as well.
+"""
+import json
+import os
+import random
+import threading
+from collections import deque
+
+from board import Board
+from generator import generate_puzzle, generate_random_start_board
+from puzzle_store import PuzzleStore
+from rater import rate
+from solver import SearchCancelled
+
+DIFFICULTIES = range(1, 11)
+
+
+class PuzzlePool:
+    """Ready (puzzle, solution, rating) entries per difficulty, refilled by a worker thread."""
+
+    def __init__(self, size=3, low_watermark=2, difficulties=DIFFICULTIES, store_path=None):
+        self.size = size
+        self.store_path = store_path
+        self.low_watermark = low_watermark
+        self.puzzles = {difficulty: deque() for difficulty in difficulties}
+        self.rng = random.Random()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.worker = None
+
+    # --- Handing out puzzles ---
+
+    def take(self, difficulty):
+        """
+        Removes and returns a ready (puzzle, solution, rating) entry for
+        `difficulty`, or None if there is none: two 9x9 lists and the rating
+        the puzzle got, which is not always `difficulty`. Never blocks on
+        generation.
+        """
+        with self.lock:
+            pool = self.puzzles[difficulty]
+            entry = pool.popleft() if pool else None
+            low = len(pool) < self.low_watermark
+        if low:
+            self.wakeup.set()
+        return entry
+
+    def count(self, difficulty):
+        with self.lock:
+            return len(self.puzzles[difficulty])
+
+    # --- Background refill ---
+
+    def start(self):
+        """Starts the refill worker thread."""
+        if self.worker is None:
+            self.stopping.clear()
+            self.worker = threading.Thread(target=self._refill_loop, name="puzzle-pool", daemon=True)
+            self.worker.start()
+            self.wakeup.set()
+
+    def stop(self, timeout=2.0):
+        """Stops the refill worker, cancelling a puzzle it is generating."""
+        if self.worker is not None:
+            self.stopping.set()
+            self.wakeup.set()
+            self.worker.join(timeout)
+            self.worker = None
+
+    def _next_to_refill(self):
+        """The difficulty with the fewest puzzles, if any is below the watermark."""
+        with self.lock:
+            counts = {d: len(pool) for d, pool in self.puzzles.items()}
+        difficulty = min(counts, key=counts.get)
+        return difficulty if counts[difficulty] < self.low_watermark else None
+
+    def _next_puzzle(self, difficulty, store):
+        """A (puzzle, solution, rating) entry from the store, or else a newly generated one."""
+        if store is not None:
+            entry = store.fetch(difficulty=difficulty, unserved=True, mark_served=True)
+            if entry is not None:
+                return (Board.from_string(entry["puzzle"]).to_rows(),
+                        Board.from_string(entry["solution"]).to_rows(), entry["difficulty"])
+        result = generate_puzzle(generate_random_start_board(self.rng), difficulty,
+                                 rng=self.rng, cancel=self.stopping)
+        rating = result.rating
+        if store is not None:
+            store.add(result.puzzle, result.solution, rating.rating, rating.hardest, served=True)
+        return result.puzzle, result.solution, rating.rating
+
+    def _refill_loop(self):
+        # sqlite3 connections belong to the thread that opened them
+        store = PuzzleStore(self.store_path) if self.store_path else None
+        try:
+            self._refill(store)
+        finally:
+            if store is not None:
+                store.close()
+
+    def _refill(self, store):
+        while not self.stopping.is_set():
+            difficulty = self._next_to_refill()
+            if difficulty is None:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            # Fill this level up completely before looking at the others again
+            while not self.stopping.is_set() and self.count(difficulty) < self.size:
+                try:
+                    entry = self._next_puzzle(difficulty, store)
+                except SearchCancelled:
+                    return
+                with self.lock:
+                    self.puzzles[difficulty].append(entry)
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """Writes the pool to `path` as JSON (atomically, via a temporary file)."""
+        with self.lock:
+            data = {str(difficulty): [{"puzzle": Board.from_rows(puzzle).to_string(),
+                                       "solution": Board.from_rows(solution).to_string(),
+                                       "rating": rating}
+                                      for puzzle, solution, rating in pool]
+                    for difficulty, pool in self.puzzles.items()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "puzzles": data}, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """
+        Adds the puzzles saved in `path` to the pool. A missing or unreadable
+        file just leaves the pool as it is. Puzzles saved without their rating
+        are rated again. Returns the number of puzzles loaded.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)["puzzles"]
+            entries = [(int(difficulty), Board.from_string(entry["puzzle"]).to_rows(),
+                        Board.from_string(entry["solution"]).to_rows(), entry.get("rating"))
+                       for difficulty, pool in data.items() for entry in pool]
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: ignoring unreadable puzzle pool file {path}: {e}")
+            return 0
+
+        loaded = 0
+        with self.lock:
+            for difficulty, puzzle, solution, rating in entries:
+                pool = self.puzzles.get(difficulty)
+                if pool is not None and len(pool) < self.size:
+                    pool.append((puzzle, solution, rating if rating is not None else rate(puzzle).rating))
+                    loaded += 1
+        return loaded
@@ -0,0 +1,208 @@
+"""Persistent SQLite store of generated puzzles.
+
+    python puzzle_store.py import puzzles.jsonl [--db FILE]
+    python puzzle_store.py stats [--db FILE]
+
+Every puzzle is stored once under the hash of its canonical form (see
+canonical.py), so a puzzle that is just a relabeled, permuted or transposed
+copy of a stored one is recognised as a duplicate and not inserted again.
+The table is indexed by difficulty (the rater.py rating), clue count and
+the hardest solving technique the puzzle needs, so fetching a matching
+puzzle is an index lookup instead of a generation run. `import` bulk-loads
+the JSON lines written by batch.py generate.
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+
+from board import Board
+from canonical import canonical_hash
+from rater import rate
+
+DEFAULT_DB = os.path.join(os.path.expanduser("~"), ".googoku_puzzles.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS puzzles (
+    id INTEGER PRIMARY KEY,
+    canonical TEXT NOT NULL UNIQUE,
+    puzzle TEXT NOT NULL,
+    solution TEXT NOT NULL,
+    difficulty INTEGER,
+    clues INTEGER NOT NULL,
+    technique TEXT,
+    served INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS puzzles_by_difficulty ON puzzles (difficulty, served);
+CREATE INDEX IF NOT EXISTS puzzles_by_clues ON puzzles (clues, served);
+CREATE INDEX IF NOT EXISTS puzzles_by_technique ON puzzles (technique, served);
+"""
+
+
+class PuzzleStore:
+    """
+    A SQLite puzzle database. Puzzles and solutions are 81-character lines.
+    Like any sqlite3 connection, a store must be used from the thread that
+    opened it.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Inserting ---
+
+    def _row(self, puzzle, solution, difficulty=None, technique=None, served=False):
+        board = Board.from_string(puzzle) if isinstance(puzzle, str) else Board.from_rows(puzzle)
+        solution = solution if isinstance(solution, str) else Board.from_rows(solution).to_string()
+        if difficulty is None:
+            rating = rate(board)
+            difficulty, technique = rating.rating, rating.hardest
+        return (canonical_hash(board), board.to_string(), solution, difficulty, board.clue_count(),
+                technique, int(served))
+
+    def add(self, puzzle, solution, difficulty=None, technique=None, served=False):
+        """
+        Inserts one puzzle (81-character line or 9x9 list). Without a
+        `difficulty` the puzzle is rated first. Returns False if an equivalent
+        puzzle is already stored.
+        """
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO puzzles (canonical, puzzle, solution, difficulty, clues, technique, served)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(puzzle, solution, difficulty, technique, served))
+        return cursor.rowcount == 1
+
+    def add_many(self, records):
+        """
+        Inserts dicts with "puzzle", "solution" and optional "rating" and
+        "technique" keys (the records batch.py generate writes) in a single
+        transaction, skipping duplicates. Returns the number inserted.
+        """
+        rows = [self._row(r["puzzle"], r["solution"], r.get("rating"), r.get("technique"))
+                for r in records]
+        before = self.db.total_changes
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO puzzles (canonical, puzzle, solution, difficulty, clues, technique)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [row[:6] for row in rows])
+        return self.db.total_changes - before
+
+    # --- Fetching ---
+
+    def _where(self, difficulty, min_clues, max_clues, technique, unserved):
+        conditions = []
+        params = []
+        if difficulty is not None:
+            conditions.append("difficulty = ?")
+            params.append(difficulty)
+        if min_clues is not None:
+            conditions.append("clues >= ?")
+            params.append(min_clues)
+        if max_clues is not None:
+            conditions.append("clues <= ?")
+            params.append(max_clues)
+        if technique is not None:
+            conditions.append("technique = ?")
+            params.append(technique)
+        if unserved:
+            conditions.append("served = 0")
+        return conditions, params
+
+    def fetch(self, difficulty=None, min_clues=None, max_clues=None, technique=None,
+              unserved=False, mark_served=False):
+        """
+        Returns a random stored puzzle matching the filters as a dict (id,
+        puzzle, solution, difficulty, clues, technique), or None.
+        unserved: only consider puzzles that were not handed out before.
+        mark_served: mark the returned puzzle as handed out.
+
+        Instead of ORDER BY random(), which reads every match, this seeks the
+        first match at or after a random id and wraps around once, so an
+        indexed lookup finds it.
+        """
+        conditions, params = self._where(difficulty, min_clues, max_clues, technique, unserved)
+        low, high = self.db.execute("SELECT min(id), max(id) FROM puzzles").fetchone()
+        if low is None:
+            return None
+        pivot = random.randint(low, high)
+        row = None
+        for id_condition in ("id >= ?", "id < ?"):
+            where = " AND ".join(conditions + [id_condition])
+            row = self.db.execute(f"SELECT * FROM puzzles WHERE {where} ORDER BY id LIMIT 1",
+                                  params + [pivot]).fetchone()
+            if row is not None:
+                break
+        if row is None:
+            return None
+        if mark_served:
+            with self.db:
+                self.db.execute("UPDATE puzzles SET served = 1 WHERE id = ?", (row["id"],))
+        return {key: row[key] for key in ("id", "puzzle", "solution", "difficulty", "clues", "technique")}
+
+    def count(self, difficulty=None, min_clues=None, max_clues=None, technique=None, unserved=False):
+        conditions, params = self._where(difficulty, min_clues, max_clues, technique, unserved)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.db.execute(f"SELECT count(*) FROM puzzles{where}", params).fetchone()[0]
+
+
+def read_records(path):
+    """Yields the records of a JSON lines file as written by batch.py generate."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    import argparse  # only the command line needs it, not the app
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"database file, default {DEFAULT_DB}")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="bulk insert batch.py generate output")
+    imp.add_argument("files", nargs="+", help="JSON lines files")
+    sub.add_parser("stats", help="puzzle counts per difficulty")
+    args = parser.parse_args()
+
+    with PuzzleStore(args.db) as store:
+        if args.command == "import":
+            for path in args.files:
+                total = inserted = 0
+                chunk = []
+                for record in read_records(path):
+                    chunk.append(record)
+                    if len(chunk) >= 1000:
+                        inserted += store.add_many(chunk)
+                        total += len(chunk)
+                        chunk = []
+                inserted += store.add_many(chunk)
+                total += len(chunk)
+                print(f"{path}: {inserted} of {total} puzzles inserted, {total - inserted} duplicates skipped",
+                      file=sys.stderr)
+
+        elif args.command == "stats":
+            rows = store.db.execute(
+                "SELECT difficulty, count(*), sum(served), min(clues), max(clues) FROM puzzles"
+                " GROUP BY difficulty ORDER BY difficulty").fetchall()
+            print("difficulty  puzzles  served  clues")
+            for difficulty, count, served, min_clues, max_clues in rows:
+                print(f"{difficulty!s:>10}  {count:7}  {served:6}  {min_clues}-{max_clues}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""Difficulty rating by human solving techniques.
+
+rate(board) solves a puzzle the way a person would: it keeps candidate
+bitmasks for the empty cells and, after every step, goes back to the easiest
+technique that still makes progress. The rating is the level of the hardest
+technique that was needed, on the same 1-10 scale as the difficulty slider:
+
+     1  hidden single
+     2  naked single
+     3  pointing, box/line reduction
+     4  naked pair, hidden pair
+     5  naked triple, hidden triple
+     6  X-wing
+     7  swordfish, XY-wing
+     8  XY-chain
+     9  forcing chain (a candidate whose singles lead to a contradiction)
+    10  none of these get any further; the puzzle needs guessing
+
+Pointing and box/line are tried before the subsets since they are the
+easier patterns to spot. Together with the rating, rate returns how often
+each technique was applied.
+"""
+from collections import Counter, namedtuple
+from itertools import combinations
+
+from board import CELL_BOX, UNITS, PEERS, board_values
+from solver import ALL_DIGITS, BIT_COUNT, BIT_DIGIT
+
+PEER_SETS = [frozenset(peers) for peers in PEERS]
+UNIT_SETS = [frozenset(unit) for unit in UNITS]
+
+GUESS_LEVEL = 10
+
+# rating: level of the hardest technique needed (0 for a full board).
+# hardest: its name, "guess" if the techniques got stuck. histogram: Counter
+# of technique name -> times applied. solved: the techniques finished the puzzle.
+Rating = namedtuple("Rating", "rating hardest histogram solved")
+
+
+def _place(values, cands, cell, bit):
+    values[cell] = BIT_DIGIT[bit]
+    cands[cell] = 0
+    clear = ~bit
+    for peer in PEERS[cell]:
+        cands[peer] &= clear
+
+
+def _bits(mask):
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        yield bit
+
+
+def _eliminate(cands, cells, mask):
+    """Removes `mask` from the candidates of `cells`; True if any had them."""
+    changed = False
+    for cell in cells:
+        if cands[cell] & mask:
+            cands[cell] &= ~mask
+            changed = True
+    return changed
+
+
+# --- Techniques ---
+#
+# Each takes the cell values and candidate masks, applies what it finds and
+# returns how many times it was applied (0 if it found nothing). The singles
+# fill in everything they find in one sweep; all other techniques stop after
+# the first deduction, so that easier techniques get the next turn.
+
+def _hidden_single(values, cands):
+    found = 0
+    for unit in UNITS:
+        once = twice = 0
+        for cell in unit:
+            m = cands[cell]
+            twice |= once & m
+            once |= m
+        for bit in _bits(once & ~twice):
+            for cell in unit:
+                if cands[cell] & bit:
+                    _place(values, cands, cell, bit)
+                    found += 1
+                    break
+    return found
+
+
+def _naked_single(values, cands):
+    found = 0
+    for cell in range(81):
+        m = cands[cell]
+        if m and not m & (m - 1):
+            _place(values, cands, cell, m)
+            found += 1
+    return found
+
+
+def _pointing(values, cands):
+    """A digit's candidates in a box all lie on one row or column: remove it from the rest of that line."""
+    for box in range(9):
+        unit = UNITS[18 + box]
+        for bit in _bits(ALL_DIGITS):
+            cells = [cell for cell in unit if cands[cell] & bit]
+            if len(cells) < 2:
+                continue
+            for line in (cells[0] // 9, 9 + cells[0] % 9):
+                if all(cell in UNIT_SETS[line] for cell in cells):
+                    if _eliminate(cands, (cell for cell in UNITS[line] if CELL_BOX[cell] != box), bit):
+                        return 1
+    return 0
+
+
+def _box_line(values, cands):
+    """A digit's candidates in a row or column all lie in one box: remove it from the rest of that box."""
+    for line in range(18):
+        for bit in _bits(ALL_DIGITS):
+            cells = [cell for cell in UNITS[line] if cands[cell] & bit]
+            if len(cells) < 2:
+                continue
+            box = CELL_BOX[cells[0]]
+            if all(CELL_BOX[cell] == box for cell in cells):
+                if _eliminate(cands, (cell for cell in UNITS[18 + box] if cell not in UNIT_SETS[line]), bit):
+                    return 1
+    return 0
+
+
+def _naked_subset(cands, size):
+    """`size` cells of a unit share `size` candidates: remove those from the unit's other cells."""
+    for unit in UNITS:
+        cells = [cell for cell in unit if 2 <= BIT_COUNT[cands[cell]] <= size]
+        for group in combinations(cells, size):
+            union = 0
+            for cell in group:
+                union |= cands[cell]
+            if BIT_COUNT[union] == size:
+                if _eliminate(cands, (cell for cell in unit if cell not in group), union):
+                    return 1
+    return 0
+
+
+def _hidden_subset(cands, size):
+    """`size` digits of a unit fit only in the same `size` cells: remove all other candidates there."""
+    for unit in UNITS:
+        # Positions within the unit where each digit can still go
+        where = {}
+        for bit in _bits(ALL_DIGITS):
+            positions = 0
+            for i, cell in enumerate(unit):
+                if cands[cell] & bit:
+                    positions |= 1 << i
+            if 2 <= BIT_COUNT[positions] <= size:
+                where[bit] = positions
+        for group in combinations(where, size):
+            positions = 0
+            for bit in group:
+                positions |= where[bit]
+            if BIT_COUNT[positions] == size:
+                others = ALL_DIGITS & ~sum(group)
+                if _eliminate(cands, (unit[i] for i in range(9) if positions >> i & 1), others):
+                    return 1
+    return 0
+
+
+def _fish(cands, size):
+    """
+    X-wing (size 2) and swordfish (size 3): a digit fits only in the same
+    `size` columns of `size` rows (or the other way round), so it can be
+    removed from those columns in every other row.
+    """
+    for bit in _bits(ALL_DIGITS):
+        for base, cover in ((0, 9), (9, 0)):
+            lines = []
+            for i in range(9):
+                positions = 0
+                for k, cell in enumerate(UNITS[base + i]):
+                    if cands[cell] & bit:
+                        positions |= 1 << k
+                if 2 <= BIT_COUNT[positions] <= size:
+                    lines.append((i, positions))
+            for group in combinations(lines, size):
+                positions = 0
+                for _, p in group:
+                    positions |= p
+                if BIT_COUNT[positions] == size:
+                    base_lines = {i for i, _ in group}
+                    targets = [cell for k in range(9) if positions >> k & 1
+                               for j, cell in enumerate(UNITS[cover + k]) if j not in base_lines]
+                    if _eliminate(cands, targets, bit):
+                        return 1
+    return 0
+
+
+def _xy_wing(values, cands):
+    """
+    A pivot {x,y} sees wings {x,z} and {y,z}: one wing is z either way, so
+    cells seeing both wings cannot be z.
+    """
+    bivalue = [cell for cell in range(81) if BIT_COUNT[cands[cell]] == 2]
+    bivalue_set = set(bivalue)
+    for pivot in bivalue:
+        pivot_mask = cands[pivot]
+        wings = [p for p in PEERS[pivot] if p in bivalue_set and BIT_COUNT[cands[p] & pivot_mask] == 1]
+        for a, b in combinations(wings, 2):
+            z = cands[a] & cands[b]
+            if BIT_COUNT[z] != 1 or z & pivot_mask or (cands[a] | cands[b]) & ~z != pivot_mask:
+                continue
+            if _eliminate(cands, PEER_SETS[a] & PEER_SETS[b] - {pivot}, z):
+                return 1
+    return 0
+
+
+def _xy_chain(values, cands):
+    """
+    A chain of bivalue cells, each seeing the next: if the first cell is not
+    z, the implications force the last one to be z. Either way one of the two
+    ends is z, so cells seeing both ends cannot be.
+    """
+    bivalue = [cell for cell in range(81) if BIT_COUNT[cands[cell]] == 2]
+    bivalue_set = set(bivalue)
+    for start in bivalue:
+        for z in _bits(cands[start]):
+            # (cell, digit it is forced to) implied by "start is not z"
+            queue = [(start, cands[start] ^ z)]
+            seen = set(queue)
+            for cell, bit in queue:
+                for peer in PEERS[cell]:
+                    if peer not in bivalue_set or not cands[peer] & bit:
+                        continue
+                    forced = (peer, cands[peer] ^ bit)
+                    if forced in seen:
+                        continue
+                    seen.add(forced)
+                    queue.append(forced)
+                    if forced[1] == z and peer != start:
+                        if _eliminate(cands, PEER_SETS[start] & PEER_SETS[peer], z):
+                            return 1
+    return 0
+
+
+def _contradicts(values, cands):
+    """
+    Applies naked and hidden singles to a copy of the state until they run
+    out; True if that empties a cell or leaves a digit with no place in a unit.
+    """
+    while True:
+        progress = False
+        for cell in range(81):
+            if not values[cell]:
+                m = cands[cell]
+                if not m:
+                    return True
+                if not m & (m - 1):
+                    _place(values, cands, cell, m)
+                    progress = True
+        for unit in UNITS:
+            once = twice = placed = 0
+            for cell in unit:
+                if values[cell]:
+                    placed |= 1 << (values[cell] - 1)
+                else:
+                    m = cands[cell]
+                    twice |= once & m
+                    once |= m
+            if once | placed != ALL_DIGITS:
+                return True
+            for bit in _bits(once & ~twice):
+                for cell in unit:
+                    if cands[cell] & bit:
+                        _place(values, cands, cell, bit)
+                        progress = True
+                        break
+        if not progress:
+            return False
+
+
+def _forcing_chain(values, cands):
+    """Removes a candidate whose placement leads to a contradiction through singles alone."""
+    cells = sorted((cell for cell in range(81) if cands[cell]), key=lambda cell: BIT_COUNT[cands[cell]])
+    for cell in cells:
+        for bit in _bits(cands[cell]):
+            trial_values = values[:]
+            trial_cands = cands[:]
+            _place(trial_values, trial_cands, cell, bit)
+            if _contradicts(trial_values, trial_cands):
+                cands[cell] &= ~bit
+                return 1
+    return 0
+
+
+# (name, level, function) in the order they are tried
+TECHNIQUES = [
+    ("hidden_single", 1, _hidden_single),
+    ("naked_single", 2, _naked_single),
+    ("pointing", 3, _pointing),
+    ("box_line", 3, _box_line),
+    ("naked_pair", 4, lambda values, cands: _naked_subset(cands, 2)),
+    ("hidden_pair", 4, lambda values, cands: _hidden_subset(cands, 2)),
+    ("naked_triple", 5, lambda values, cands: _naked_subset(cands, 3)),
+    ("hidden_triple", 5, lambda values, cands: _hidden_subset(cands, 3)),
+    ("x_wing", 6, lambda values, cands: _fish(cands, 2)),
+    ("swordfish", 7, lambda values, cands: _fish(cands, 3)),
+    ("xy_wing", 7, _xy_wing),
+    ("xy_chain", 8, _xy_chain),
+    ("forcing_chain", 9, _forcing_chain),
+]
+
+
+def rate(board):
+    """
+    Rates a puzzle (Board or 9x9 list of lists) by the techniques a person
+    needs to solve it. Returns a Rating. The puzzle should have a unique
+    solution; for others the rating is meaningless.
+    """
+    values = board_values(board)
+    cands = [0] * 81
+    for cell, num in enumerate(values):
+        if not num:
+            used = 0
+            for peer in PEERS[cell]:
+                if values[peer]:
+                    used |= 1 << (values[peer] - 1)
+            cands[cell] = ALL_DIGITS & ~used
+
+    histogram = Counter()
+    rating = 0
+    hardest = None
+    while 0 in values:
+        for name, level, technique in TECHNIQUES:
+            applied = technique(values, cands)
+            if applied:
+                histogram[name] += applied
+                if level > rating:
+                    rating, hardest = level, name
+                break
+        else:
+            return Rating(GUESS_LEVEL, "guess", histogram, False)
+    return Rating(rating, hardest, histogram, True)
@@ -0,0 +1,943 @@
+"""Sudoku solver engines.
+
+Boards are 9x9 lists of lists with 0 for empty cells, the same format used by
+googoku.py and advanced_generator.py, or board.Board objects. Solutions are
+always returned as lists of lists.
+
+The 4x4, 16x16 and 25x25 grids (see board.BOX_SIZES) are solved by every
+backend as well. The bitmask engine is tuned to 9x9 through its tables; for
+the other sizes the "bitmask" and "iterative" backends use GridState, the
+same search on the tables of a board.Geometry.
+
+The default engine keeps a bitmask of used digits per row, column and box,
+fills naked and hidden singles before every branch and always branches on the
+empty cell with the fewest candidates; "iterative" runs the same search with
+an explicit stack instead of recursion. The original recursive backtracker is
+kept as a reference implementation to cross-check against, and dlx.py
+provides a Dancing Links solver. All of them are selectable through the
+`backend` argument of find_all_solutions.
+
+SolverCache puts a thread-safe LRU cache in front of that API, for callers
+that keep asking about the same boards.
+"""
+import copy
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import dlx
+from board import Board, CELL_ROW, CELL_COL, CELL_BOX, UNITS, board_values, geometry, geometry_of
+
+ALL_DIGITS = 0x1FF  # bit d-1 set <=> digit d
+
+BIT_COUNT = [bin(m).count("1") for m in range(ALL_DIGITS + 1)]
+BIT_DIGIT = {1 << d: d + 1 for d in range(9)}
+
+
+# --- Reference backtracker ---
+
+def _column_and_box(geo):
+    """(row, col) of the cells in each cell's column and box."""
+    return [[divmod(p, geo.size) for u in geo.cell_units[cell][1:] for p in geo.units[u]]
+            for cell in range(geo.cells)]
+
+# Precomputed for is_valid, by grid side length
+_COLUMN_AND_BOX = {9: _column_and_box(geometry(3))}
+
+def is_valid(board, row, col, num):
+    # Check row
+    if num in board[row]:
+        return False
+    # Check column and box
+    size = len(board)
+    try:
+        column_and_box = _COLUMN_AND_BOX[size]
+    except KeyError:
+        column_and_box = _COLUMN_AND_BOX[size] = _column_and_box(geometry_of(size * size))
+    for r, c in column_and_box[row * size + col]:
+        if board[r][c] == num:
+            return False
+    return True
+
+def find_empty(board):
+    for r, row in enumerate(board):
+        for c, num in enumerate(row):
+            if num == 0:
+                return (r, c)
+    return None
+
+def find_all_solutions_backtrack(board, max_solutions=2, limit=None, stats=None):
+    """The original naive solver: first empty cell, digits 1-9 in order."""
+    if isinstance(board, Board):
+        board = board.to_rows()
+    solutions = []
+    if stats is not None:
+        stats.searches += 1
+
+    def backtrack_find(b, depth=0):
+        nonlocal solutions
+        if limit is not None:
+            limit.tick()
+        if stats is not None:
+            stats.nodes += 1
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+        if len(solutions) >= max_solutions:
+            return True # Found enough solutions
+
+        find = find_empty(b)
+        if not find:
+            solutions.append(copy.deepcopy(b))
+            return len(solutions) >= max_solutions
+
+        row, col = find
+        tried = False
+        for num in range(1, len(b) + 1):
+            if is_valid(b, row, col, num):
+                tried = True
+                b[row][col] = num
+                if backtrack_find(b, depth + 1):
+                    return True # Propagate stop signal
+                b[row][col] = 0 # Backtrack
+
+        if stats is not None and not tried:
+            stats.backtracks += 1
+        return False # Did not find enough solutions from this path
+
+    board_copy = copy.deepcopy(board)
+    backtrack_find(board_copy)
+    return solutions
+
+
+# --- Search limits ---
+
+class SearchLimitReached(Exception):
+    """Raised when a search runs out of its node or time budget."""
+
+
+class SearchCancelled(Exception):
+    """Raised when a search is cancelled through its SearchLimit's cancel event."""
+
+
+class SearchLimit:
+    """
+    Caps the number of search nodes and/or the wall-clock time a search may
+    use. `deadline` is a time.monotonic() timestamp. `cancel` is an optional
+    threading.Event another thread can set to abort the search. One limit can
+    be shared by many searches to budget all of them together.
+    """
+
+    def __init__(self, max_nodes=None, deadline=None, cancel=None):
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+        self.cancel = cancel
+        self.nodes = 0
+
+    def tick(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchLimitReached(f"node budget of {self.max_nodes} exhausted")
+        # Reading the clock on every node would cost more than the node itself
+        if self.nodes & 63 == 0:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise SearchLimitReached("deadline passed")
+            if self.cancel is not None and self.cancel.is_set():
+                raise SearchCancelled()
+
+
+class SolverStats:
+    """
+    Search counters, filled in by any backend it is passed to as `stats`.
+    One object can collect many searches. Without it the solvers skip all
+    counting, at the cost of one `is None` test per node.
+
+    searches: solver runs. nodes: search nodes expanded. backtracks: dead
+    ends, nodes where some cell or constraint had no candidate left.
+    propagations: cells filled by naked/hidden singles (bitmask engine only).
+    max_depth: deepest branching level.
+    """
+
+    __slots__ = ("searches", "nodes", "backtracks", "propagations", "max_depth")
+
+    def __init__(self):
+        self.searches = 0
+        self.nodes = 0
+        self.backtracks = 0
+        self.propagations = 0
+        self.max_depth = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "SolverStats(" + ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__) + ")"
+
+
+# --- Bitmask engine ---
+
+def _place(values, rows, cols, boxes, cell, bit):
+    values[cell] = BIT_DIGIT[bit]
+    rows[CELL_ROW[cell]] |= bit
+    cols[CELL_COL[cell]] |= bit
+    boxes[CELL_BOX[cell]] |= bit
+
+def _unplace(values, rows, cols, boxes, cell):
+    bit = ~(1 << (values[cell] - 1))
+    values[cell] = 0
+    rows[CELL_ROW[cell]] &= bit
+    cols[CELL_COL[cell]] &= bit
+    boxes[CELL_BOX[cell]] &= bit
+
+def _load(values):
+    """
+    Returns (values, rows, cols, boxes) for the 81 cell `values`, or None if
+    two of the clues conflict.
+    """
+    rows = [0] * 9
+    cols = [0] * 9
+    boxes = [0] * 9
+    for cell, num in enumerate(values):
+        if num == 0:
+            continue
+        bit = 1 << (num - 1)
+        r, c, b = CELL_ROW[cell], CELL_COL[cell], CELL_BOX[cell]
+        if (rows[r] | cols[c] | boxes[b]) & bit:
+            return None
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+    return values, rows, cols, boxes
+
+def _propagate(values, rows, cols, boxes, trail):
+    """
+    Fills naked and hidden singles until neither is left, recording every
+    filled cell in `trail` so the caller can undo them.
+    Returns (cell, candidate mask) of the empty cell with the fewest
+    candidates, (-1, 0) if the board is full, or None on a contradiction.
+    """
+    while True:
+        # Naked singles, remembering the most constrained cell on the way
+        best_cell = -1
+        best_mask = 0
+        best_count = 10
+        progress = False
+        for cell in range(81):
+            if values[cell]:
+                continue
+            mask = ALL_DIGITS & ~(rows[CELL_ROW[cell]] | cols[CELL_COL[cell]] | boxes[CELL_BOX[cell]])
+            if not mask:
+                return None
+            count = BIT_COUNT[mask]
+            if count == 1:
+                _place(values, rows, cols, boxes, cell, mask)
+                trail.append(cell)
+                progress = True
+            elif count < best_count:
+                best_cell, best_mask, best_count = cell, mask, count
+        if progress:
+            continue
+        if best_cell < 0:
+            return (-1, 0)
+
+        # Hidden singles: a digit that fits in only one cell of a unit
+        for unit in UNITS:
+            once = twice = filled = 0
+            for cell in unit:
+                value = values[cell]
+                if value:
+                    filled |= 1 << (value - 1)
+                    continue
+                mask = ALL_DIGITS & ~(rows[CELL_ROW[cell]] | cols[CELL_COL[cell]] | boxes[CELL_BOX[cell]])
+                twice |= once & mask
+                once |= mask
+            if once | filled != ALL_DIGITS:
+                return None # Some digit has no place left in this unit
+            singles = once & ~twice
+            while singles:
+                bit = singles & -singles
+                singles ^= bit
+                for cell in unit:
+                    if not values[cell] and bit & ~(rows[CELL_ROW[cell]] | cols[CELL_COL[cell]] | boxes[CELL_BOX[cell]]):
+                        _place(values, rows, cols, boxes, cell, bit)
+                        trail.append(cell)
+                        progress = True
+                        break
+                else:
+                    return None # Two digits were forced into the same cell
+        if not progress:
+            return (best_cell, best_mask)
+
+def _search(values, rows, cols, boxes, solutions, max_solutions, limit=None, stats=None, depth=0):
+    if limit is not None:
+        limit.tick()
+    trail = []
+    try:
+        choice = _propagate(values, rows, cols, boxes, trail)
+        if stats is not None:
+            stats.nodes += 1
+            stats.propagations += len(trail)
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+            if choice is None:
+                stats.backtracks += 1
+        if choice is not None:
+            cell, mask = choice
+            if cell < 0:
+                solutions.append([values[r * 9:r * 9 + 9] for r in range(9)])
+            else:
+                while mask and len(solutions) < max_solutions:
+                    bit = mask & -mask
+                    mask ^= bit
+                    _place(values, rows, cols, boxes, cell, bit)
+                    try:
+                        _search(values, rows, cols, boxes, solutions, max_solutions, limit, stats, depth + 1)
+                    finally:
+                        _unplace(values, rows, cols, boxes, cell)
+    finally:
+        # Also undone when a SearchLimitReached unwinds the search
+        for cell in trail:
+            _unplace(values, rows, cols, boxes, cell)
+
+def find_all_solutions_bitmask(board, max_solutions=2, limit=None, stats=None):
+    """
+    Returns up to `max_solutions` solutions of `board` as new 9x9 lists.
+    A board whose clues already conflict has no solutions.
+    """
+    values = board_values(board)
+    if len(values) != 81:
+        return find_all_solutions_grid(board, max_solutions, limit, stats)
+    state = _load(values)
+    if state is None:
+        return []
+    values, rows, cols, boxes = state
+
+    solutions = []
+    if stats is not None:
+        stats.searches += 1
+    if max_solutions > 0:
+        _search(values, rows, cols, boxes, solutions, max_solutions, limit, stats)
+    return solutions
+
+
+def find_all_solutions_iterative(board, max_solutions=2, limit=None, stats=None):
+    """
+    The bitmask engine without recursion: returns the same solutions as
+    find_all_solutions_bitmask, in the same order.
+
+    Each branching level is one entry in preallocated stacks: the branching
+    cell, the candidates still to try there, and the trail position where
+    that level's propagated cells start. Backing up a level unplaces its
+    cells from the trail instead of restoring a copy.
+    """
+    values = board_values(board)
+    if len(values) != 81:
+        return find_all_solutions_grid(board, max_solutions, limit, stats)
+    state = _load(values)
+    if state is None:
+        return []
+    values, rows, cols, boxes = state
+    solutions = []
+    if stats is not None:
+        stats.searches += 1
+    if max_solutions <= 0:
+        return solutions
+
+    stack_cell = [0] * 81
+    stack_mask = [0] * 81
+    stack_mark = [0] * 81
+    depth = 0
+    trail = []
+    while True:
+        # Expand a new node: propagate, then either stop here or push a level
+        if limit is not None:
+            limit.tick()
+        mark = len(trail)
+        choice = _propagate(values, rows, cols, boxes, trail)
+        if stats is not None:
+            stats.nodes += 1
+            stats.propagations += len(trail) - mark
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+            if choice is None:
+                stats.backtracks += 1
+        if choice is not None and choice[0] >= 0:
+            stack_cell[depth], stack_mask[depth] = choice
+            stack_mark[depth] = mark
+            depth += 1
+        else:
+            if choice is not None:
+                solutions.append([values[r * 9:r * 9 + 9] for r in range(9)])
+            while len(trail) > mark:
+                _unplace(values, rows, cols, boxes, trail.pop())
+
+        # Move on to the next untried candidate, backing up exhausted levels
+        while depth:
+            level = depth - 1
+            cell = stack_cell[level]
+            if values[cell]:
+                _unplace(values, rows, cols, boxes, cell)
+            mask = stack_mask[level]
+            if mask and len(solutions) < max_solutions:
+                bit = mask & -mask
+                stack_mask[level] = mask ^ bit
+                _place(values, rows, cols, boxes, cell, bit)
+                break
+            mark = stack_mark[level]
+            while len(trail) > mark:
+                _unplace(values, rows, cols, boxes, trail.pop())
+            depth -= 1
+        else:
+            return solutions
+
+
+def _fill_random(values, rows, cols, boxes, rng):
+    trail = []
+    choice = _propagate(values, rows, cols, boxes, trail)
+    if choice is not None:
+        cell, mask = choice
+        if cell < 0:
+            return True
+        bits = [bit for bit in BIT_DIGIT if mask & bit]
+        rng.shuffle(bits)
+        for bit in bits:
+            _place(values, rows, cols, boxes, cell, bit)
+            if _fill_random(values, rows, cols, boxes, rng):
+                return True
+            _unplace(values, rows, cols, boxes, cell)
+    for cell in trail:
+        _unplace(values, rows, cols, boxes, cell)
+    return False
+
+def random_solution(board, rng=random):
+    """
+    Returns one solution of `board` picked by trying the candidates of each
+    branching cell in random order, or None if there is none. With an empty
+    board this yields a random full grid.
+    """
+    values = board_values(board)
+    if len(values) != 81:
+        state = GridState.load(board)
+        if state is None:
+            return None
+        solutions = []
+        state.search(solutions, 1, rng=rng)
+        return solutions[0] if solutions else None
+    state = _load(values)
+    if state is None:
+        return None
+    values, rows, cols, boxes = state
+    if not _fill_random(values, rows, cols, boxes, rng):
+        return None
+    return [values[r * 9:r * 9 + 9] for r in range(9)]
+
+
+class Digger:
+    """
+    Removes clues from a solved grid while keeping its solution unique.
+
+    The puzzle starts out as the full `solution` and its row/column/box masks
+    are kept up to date between removals, so nothing is copied or re-parsed
+    per step. Since the puzzle before a removal has exactly one solution, any
+    second solution afterwards must put a different digit into the removed
+    cell; try_remove therefore only searches the branches where it does.
+    """
+
+    def __init__(self, solution):
+        self.solution = board_values(solution)
+        self.values = self.solution[:]
+        self.rows = [ALL_DIGITS] * 9
+        self.cols = [ALL_DIGITS] * 9
+        self.boxes = [ALL_DIGITS] * 9
+
+    def try_remove(self, row, col, limit=None, stats=None):
+        """
+        Empties (row, col) if the solution stays unique. Returns True if it did.
+        If `limit` (a SearchLimit) runs out or is cancelled, the cell keeps its
+        value and SearchLimitReached or SearchCancelled is raised. The search
+        is counted in `stats` (a SolverStats) if given.
+        """
+        cell = row * 9 + col
+        value = self.values[cell]
+        if not value:
+            return True
+        values, rows, cols, boxes = self.values, self.rows, self.cols, self.boxes
+        _unplace(values, rows, cols, boxes, cell)
+        bit = 1 << (value - 1)
+        alternatives = ALL_DIGITS & ~(rows[row] | cols[col] | boxes[CELL_BOX[cell]] | bit)
+        found = []
+        if stats is not None:
+            stats.searches += 1
+        try:
+            while alternatives and not found:
+                other = alternatives & -alternatives
+                alternatives ^= other
+                _place(values, rows, cols, boxes, cell, other)
+                try:
+                    _search(values, rows, cols, boxes, found, 1, limit, stats, 1)
+                finally:
+                    _unplace(values, rows, cols, boxes, cell)
+        finally:
+            _place(values, rows, cols, boxes, cell, bit)
+        if found:
+            return False
+        _unplace(values, rows, cols, boxes, cell)
+        return True
+
+    def put_back(self, row, col):
+        """Refills (row, col) with its solution value, undoing a removal."""
+        cell = row * 9 + col
+        if not self.values[cell]:
+            _place(self.values, self.rows, self.cols, self.boxes, cell, 1 << (self.solution[cell] - 1))
+
+    def puzzle(self):
+        """The current puzzle as a new 9x9 list."""
+        return [self.values[r * 9:r * 9 + 9] for r in range(9)]
+
+
+# --- Other grid sizes ---
+
+class GridState:
+    """
+    The bitmask engine for a grid of any supported size: cell values plus
+    the used digits of every row, column and box, on the index tables of a
+    board.Geometry. Propagation and branching work as in _propagate, and the
+    search keeps its levels on an explicit stack as in
+    find_all_solutions_iterative, since a 25x25 search can branch deeper
+    than Python's recursion limit. For 9x9 it finds the same solutions in
+    the same order as the "bitmask" backend, only slower.
+    """
+
+    __slots__ = ("geometry", "all_digits", "values", "rows", "cols", "boxes")
+
+    def __init__(self, geo):
+        self.geometry = geo
+        self.all_digits = (1 << geo.size) - 1
+        self.values = [0] * geo.cells
+        self.rows = [0] * geo.size
+        self.cols = [0] * geo.size
+        self.boxes = [0] * geo.size
+
+    @classmethod
+    def load(cls, board):
+        """The state of `board`, or None if two of its clues conflict."""
+        values = board_values(board)
+        state = cls(geometry_of(len(values)))
+        for cell, num in enumerate(values):
+            if num:
+                bit = 1 << (num - 1)
+                if not state.candidates(cell) & bit:
+                    return None
+                state.place(cell, bit)
+        return state
+
+    def candidates(self, cell):
+        geo = self.geometry
+        return self.all_digits & ~(self.rows[geo.cell_row[cell]] | self.cols[geo.cell_col[cell]] |
+                                   self.boxes[geo.cell_box[cell]])
+
+    def place(self, cell, bit):
+        geo = self.geometry
+        self.values[cell] = bit.bit_length()
+        self.rows[geo.cell_row[cell]] |= bit
+        self.cols[geo.cell_col[cell]] |= bit
+        self.boxes[geo.cell_box[cell]] |= bit
+
+    def unplace(self, cell):
+        geo = self.geometry
+        bit = ~(1 << (self.values[cell] - 1))
+        self.values[cell] = 0
+        self.rows[geo.cell_row[cell]] &= bit
+        self.cols[geo.cell_col[cell]] &= bit
+        self.boxes[geo.cell_box[cell]] &= bit
+
+    def to_rows(self):
+        size = self.geometry.size
+        values = self.values
+        return [values[r:r + size] for r in range(0, len(values), size)]
+
+    def propagate(self, trail):
+        """Fills naked and hidden singles; same contract as _propagate."""
+        geo = self.geometry
+        values, rows, cols, boxes = self.values, self.rows, self.cols, self.boxes
+        cell_row, cell_col, cell_box = geo.cell_row, geo.cell_col, geo.cell_box
+        all_digits = self.all_digits
+        cells = range(geo.cells)
+        while True:
+            best_cell = -1
+            best_mask = 0
+            best_count = geo.size + 1
+            progress = False
+            for cell in cells:
+                if values[cell]:
+                    continue
+                r, c, b = cell_row[cell], cell_col[cell], cell_box[cell]
+                mask = all_digits & ~(rows[r] | cols[c] | boxes[b])
+                if not mask:
+                    return None
+                if not mask & (mask - 1):
+                    values[cell] = mask.bit_length()
+                    rows[r] |= mask
+                    cols[c] |= mask
+                    boxes[b] |= mask
+                    trail.append(cell)
+                    progress = True
+                elif best_count > 2:
+                    count = mask.bit_count()
+                    if count < best_count:
+                        best_cell, best_mask, best_count = cell, mask, count
+            if progress:
+                continue
+            if best_cell < 0:
+                return (-1, 0)
+
+            for unit in geo.units:
+                once = twice = filled = 0
+                for cell in unit:
+                    value = values[cell]
+                    if value:
+                        filled |= 1 << (value - 1)
+                        continue
+                    mask = all_digits & ~(rows[cell_row[cell]] | cols[cell_col[cell]] | boxes[cell_box[cell]])
+                    twice |= once & mask
+                    once |= mask
+                if once | filled != all_digits:
+                    return None
+                singles = once & ~twice
+                while singles:
+                    bit = singles & -singles
+                    singles ^= bit
+                    for cell in unit:
+                        if not values[cell] and bit & ~(rows[cell_row[cell]] | cols[cell_col[cell]] |
+                                                        boxes[cell_box[cell]]):
+                            self.place(cell, bit)
+                            trail.append(cell)
+                            progress = True
+                            break
+                    else:
+                        return None
+            if not progress:
+                return (best_cell, best_mask)
+
+    def search(self, solutions, max_solutions, limit=None, stats=None, depth=0, rng=None):
+        """
+        Appends up to `max_solutions` solutions to `solutions`, counting the
+        search in `limit` and `stats` like _search, whose level numbering
+        starts at `depth`. With `rng` the candidates of every branching cell
+        are tried in random order. The state is left as it was, also when
+        the limit runs out.
+        """
+        if max_solutions <= len(solutions):
+            return
+        n_cells = self.geometry.cells
+        stack_cell = [0] * n_cells
+        stack_mask = [0] * n_cells
+        stack_mark = [0] * n_cells
+        level = 0
+        trail = []
+        try:
+            while True:
+                if limit is not None:
+                    limit.tick()
+                mark = len(trail)
+                choice = self.propagate(trail)
+                if stats is not None:
+                    stats.nodes += 1
+                    stats.propagations += len(trail) - mark
+                    if depth + level > stats.max_depth:
+                        stats.max_depth = depth + level
+                    if choice is None:
+                        stats.backtracks += 1
+                if choice is not None and choice[0] >= 0:
+                    stack_cell[level], stack_mask[level] = choice
+                    stack_mark[level] = mark
+                    level += 1
+                else:
+                    if choice is not None:
+                        solutions.append(self.to_rows())
+                    while len(trail) > mark:
+                        self.unplace(trail.pop())
+
+                while level:
+                    top = level - 1
+                    cell = stack_cell[top]
+                    if self.values[cell]:
+                        self.unplace(cell)
+                    mask = stack_mask[top]
+                    if mask and len(solutions) < max_solutions:
+                        if rng is None:
+                            bit = mask & -mask
+                        else:
+                            bit = rng.choice([1 << d for d in range(mask.bit_length()) if mask >> d & 1])
+                        stack_mask[top] = mask ^ bit
+                        self.place(cell, bit)
+                        break
+                    mark = stack_mark[top]
+                    while len(trail) > mark:
+                        self.unplace(trail.pop())
+                    level -= 1
+                else:
+                    return
+        finally:
+            # Only left over when a SearchLimitReached unwinds the search
+            for cell in trail:
+                self.unplace(cell)
+            for top in range(level):
+                if self.values[stack_cell[top]]:
+                    self.unplace(stack_cell[top])
+
+
+def find_all_solutions_grid(board, max_solutions=2, limit=None, stats=None):
+    """
+    Returns up to `max_solutions` solutions of `board`, of any supported
+    size, found with GridState. The "bitmask" and "iterative" backends
+    hand every board that is not 9x9 to this function.
+    """
+    state = GridState.load(board)
+    if state is None:
+        return []
+    solutions = []
+    if stats is not None:
+        stats.searches += 1
+    state.search(solutions, max_solutions, limit, stats)
+    return solutions
+
+
+class GridDigger:
+    """Digger for grids of any supported size, on a GridState."""
+
+    def __init__(self, solution):
+        self.solution = board_values(solution)
+        self.state = GridState.load(solution)
+        if self.state is None:
+            raise ValueError("The solution has conflicting cells")
+
+    def try_remove(self, row, col, limit=None, stats=None):
+        """Same as Digger.try_remove."""
+        state = self.state
+        cell = row * state.geometry.size + col
+        value = state.values[cell]
+        if not value:
+            return True
+        state.unplace(cell)
+        bit = 1 << (value - 1)
+        alternatives = state.candidates(cell) & ~bit
+        found = []
+        if stats is not None:
+            stats.searches += 1
+        try:
+            while alternatives and not found:
+                other = alternatives & -alternatives
+                alternatives ^= other
+                state.place(cell, other)
+                try:
+                    state.search(found, 1, limit, stats, 1)
+                finally:
+                    state.unplace(cell)
+        finally:
+            state.place(cell, bit)
+        if found:
+            return False
+        state.unplace(cell)
+        return True
+
+    def put_back(self, row, col):
+        """Refills (row, col) with its solution value, undoing a removal."""
+        state = self.state
+        cell = row * state.geometry.size + col
+        if not state.values[cell]:
+            state.place(cell, 1 << (self.solution[cell] - 1))
+
+    def puzzle(self):
+        """The current puzzle as a new list of lists."""
+        return self.state.to_rows()
+
+
+# --- Public API ---
+
+BACKENDS = {
+    "bitmask": find_all_solutions_bitmask,
+    "iterative": find_all_solutions_iterative,
+    "grid": find_all_solutions_grid,
+    "dlx": dlx.find_all_solutions,
+    "backtrack": find_all_solutions_backtrack,
+}
+DEFAULT_BACKEND = "bitmask"
+
+def find_all_solutions(board, max_solutions=2, backend=DEFAULT_BACKEND, limit=None, stats=None):
+    """
+    Returns up to `max_solutions` solutions of `board`, using the solver
+    named by `backend` (one of BACKENDS). Every backend counts its search
+    nodes in `limit` (a SearchLimit) and stops when it runs out, and
+    collects its counters in `stats` (a SolverStats).
+    """
+    try:
+        solve = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown solver backend {backend!r}, expected one of {sorted(BACKENDS)}") from None
+    return solve(board, max_solutions, limit, stats)
+
+def count_solutions(board, max_solutions=2, backend=DEFAULT_BACKEND, limit=None, stats=None):
+    """
+    Counts the solutions of `board`, stopping as soon as `max_solutions` are
+    found. `limit` and `stats` are passed on as in find_all_solutions.
+    """
+    return len(find_all_solutions(board, max_solutions, backend, limit, stats))
+
+def solve_and_check_unique(board, backend=DEFAULT_BACKEND, limit=None, stats=None):
+    return count_solutions(board, 2, backend, limit, stats) == 1
+
+def solve_first(board, backend=DEFAULT_BACKEND, limit=None, stats=None):
+    solutions = find_all_solutions(board, 1, backend, limit, stats)
+    return solutions[0] if solutions else None
+
+
+# --- Memoization ---
+
+def pack_board(board):
+    """The cell values of a Board or a list of lists as bytes, one byte per cell."""
+    if isinstance(board, Board):
+        return bytes(board.cells)
+    return bytes(board_values(board))
+
+
+class SolverCache:
+    """
+    A bounded LRU cache in front of the solver API, keyed by the packed board
+    (see pack_board) together with the backend and the number of solutions
+    asked for. Holds at most `capacity` results and drops the least recently
+    used one beyond that. hits and misses count the lookups.
+
+    Safe to share between threads: the table is only touched under a lock,
+    and the solving itself runs outside of it, so two threads that miss on
+    the same board both solve it and store the same result. A search stopped
+    by its `limit` raises as usual and stores nothing. Results are kept as
+    bytes and handed out as new lists of lists, so callers may modify them.
+    """
+
+    __slots__ = ("capacity", "hits", "misses", "_results", "_lock")
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def find_all_solutions(self, board, max_solutions=2, backend=DEFAULT_BACKEND, limit=None):
+        """Like the module's find_all_solutions, answered from the cache when it can be."""
+        try:
+            key = (pack_board(board), max_solutions, backend)
+        except ValueError:  # a value beyond a byte; no board of ours
+            return find_all_solutions(board, max_solutions, backend, limit)
+        with self._lock:
+            packed = self._results.get(key)
+            if packed is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if packed is None:
+            solutions = find_all_solutions(board, max_solutions, backend, limit)
+            packed = tuple(pack_board(solution) for solution in solutions)
+            with self._lock:
+                self._results[key] = packed
+                self._results.move_to_end(key)
+                while len(self._results) > self.capacity:
+                    self._results.popitem(last=False)
+            return solutions
+        size = geometry_of(len(key[0])).size
+        return [[list(solution[r * size:(r + 1) * size]) for r in range(size)] for solution in packed]
+
+    def count_solutions(self, board, max_solutions=2, backend=DEFAULT_BACKEND, limit=None):
+        return len(self.find_all_solutions(board, max_solutions, backend, limit))
+
+    def solve_and_check_unique(self, board, backend=DEFAULT_BACKEND, limit=None):
+        return self.count_solutions(board, 2, backend, limit) == 1
+
+    def solve_first(self, board, backend=DEFAULT_BACKEND, limit=None):
+        solutions = self.find_all_solutions(board, 1, backend, limit)
+        return solutions[0] if solutions else None
+
+    def clear(self):
+        """Drops all results; the counters keep counting."""
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self):
+        return len(self._results)
+
+    def as_dict(self):
+        return {"capacity": self.capacity, "size": len(self), "hits": self.hits, "misses": self.misses}
+
+    def __repr__(self):
+        return "SolverCache(" + ", ".join(f"{name}={value}" for name, value in self.as_dict().items()) + ")"
+
+
+# --- Cross-check against the reference backtracker ---
+
+def _is_solution_of(solution, board):
+    size = len(board)
+    for r in range(size):
+        for c in range(size):
+            if board[r][c] and board[r][c] != solution[r][c]:
+                return False
+    return all(sorted(solution[cell // size][cell % size] for cell in unit) == list(range(1, size + 1))
+               for unit in geometry_of(size * size).units)
+
+def cross_check(trials=200, max_solutions=3, seed=None, backend=DEFAULT_BACKEND, box=3):
+    """
+    Compares the `backend` solver with find_all_solutions_backtrack on random
+    puzzles with boxes of `box` x `box` cells. Both must agree on the number
+    of solutions found (up to `max_solutions`), every solution must be
+    valid, and when fewer than `max_solutions` exist the solutions
+    themselves must be identical. Returns the number of mismatches.
+    """
+    geo = geometry(box)
+    size, n_cells = geo.size, geo.cells
+    rng = random.Random(seed)
+    mismatches = 0
+    for trial in range(trials):
+        # A random full grid from a shuffled first row, then a random number of holes
+        first_row = list(range(1, size + 1))
+        rng.shuffle(first_row)
+        seed_board = [first_row] + [[0] * size for _ in range(size - 1)]
+        board = solve_first(seed_board)
+        cells = list(range(n_cells))
+        rng.shuffle(cells)
+        holes = rng.randint(n_cells * 20 // 81, n_cells * 55 // 81)
+        for cell in cells[:holes]:
+            board[cell // size][cell % size] = 0
+        # Sometimes replace a clue by another legal digit, which may leave the
+        # puzzle without a solution. Only on fuller boards: proving there is
+        # none takes the reference backtracker a very long time otherwise.
+        if holes <= n_cells * 35 // 81 and rng.random() < 0.5:
+            r, c = divmod(cells[holes], size)
+            board[r][c] = 0
+            num = rng.randint(1, size)
+            if is_valid(board, r, c, num):
+                board[r][c] = num
+
+        fast = find_all_solutions(board, max_solutions, backend)
+        slow = find_all_solutions_backtrack(board, max_solutions)
+        ok = len(fast) == len(slow) and all(_is_solution_of(s, board) for s in fast)
+        if ok and len(slow) < max_solutions:
+            ok = sorted(fast) == sorted(slow)
+        if not ok:
+            mismatches += 1
+            print(f"Mismatch in trial {trial}: {len(fast)} vs {len(slow)} solutions")
+            print(board)
+    return mismatches
+
+
+if __name__ == "__main__":
+    for box in (3, 2):
+        for backend in BACKENDS:
+            if backend == "backtrack":
+                continue
+            size = box * box
+            failures = cross_check(seed=1, backend=backend, box=box)
+            if failures:
+                print(f"❌ {backend}: {failures} mismatches against the reference backtracker on {size}x{size}")
+            else:
+                print(f"✅ {backend} solver agrees with the reference backtracker on {size}x{size}")
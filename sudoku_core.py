@@ -0,0 +1,46 @@
+"""The headless core in one module: boards, solvers, generator and the rest.
+
+    import sudoku_core
+    result = sudoku_core.generate_puzzle(sudoku_core.generate_random_start_board(), difficulty=5)
+    solution = sudoku_core.solve_first(result.puzzle)
+
+Every name here is re-exported from the module that defines it (board.py,
+solver.py, generator.py, rater.py, ...), and that module is only imported the
+first time one of its names is looked up. So `import sudoku_core` costs next
+to nothing, a job pays only for the parts it uses (the NumPy batch solver
+and the SQLite store are the heavy ones), and tkinter is never imported:
+googoku.py, the app, is the only module that needs it.
+"""
+# The public names of each module
+_MODULES = {
+    "board": ("BOX_SIZES", "DIGIT_CHARS", "Board", "Geometry", "geometry", "geometry_of", "board_values",
+              "find_conflicts"),
+    "solver": ("BACKENDS", "DEFAULT_BACKEND", "find_all_solutions", "count_solutions", "solve_and_check_unique",
+               "solve_first", "random_solution", "is_valid", "SearchLimit", "SearchLimitReached",
+               "SearchCancelled", "SolverStats", "SolverCache", "pack_board", "cross_check"),
+    "generator": ("DigBudget", "DigResult", "GenerationStats", "dig_puzzle", "generate_puzzle", "generate_sudoku",
+                  "generate_solved_grid", "generate_random_start_board", "transform_grid", "print_board"),
+    "rater": ("Rating", "TECHNIQUES", "rate"),
+    "canonical": ("canonical_form", "canonical_hash"),
+    "notes": ("PencilNotes",),
+    "vector_solver": ("find_all_solutions_batch", "solve_first_batch"),
+    "puzzle_store": ("PuzzleStore",),
+    "puzzle_pool": ("PuzzlePool",),
+}
+_SOURCE = {name: module for module, names in _MODULES.items() for name in names}
+
+__all__ = sorted(_SOURCE)
+
+
+def __getattr__(name):
+    try:
+        module = _SOURCE[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(__import__(module), name)
+    globals()[name] = value  # found directly from now on
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | _SOURCE.keys())
@@ -0,0 +1,117 @@
+"""Vectorized batch solving with NumPy.
+
+find_all_solutions_batch(boards) answers like calling
+solver.find_all_solutions on every board, but runs the constraint
+propagation of the whole batch at once: the cell values of B boards are one
+(B, 81) array, and every round fills the naked and hidden singles of all
+boards with a handful of array operations. Boards that propagation alone
+solves, or proves unsolvable, never reach the scalar solver; the rest are
+handed to it with everything propagation filled in, so their search starts
+where the vectorized rounds left off. A board solved by singles alone has
+exactly one solution.
+
+NumPy is optional. Without it, and for boards that are not 9x9, every board
+goes straight to the scalar solver.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from board import CELL_UNITS, UNITS, board_values
+from solver import ALL_DIGITS, BIT_COUNT, BIT_DIGIT, DEFAULT_BACKEND, find_all_solutions
+
+if np is not None:
+    _UNITS = np.array(UNITS, dtype=np.intp)             # (27, 9) cells of each unit
+    _CELL_UNITS = np.array(CELL_UNITS, dtype=np.intp)   # (81, 3) units of each cell
+    _DIGIT_BITS = np.array([1 << d for d in range(9)], dtype=np.uint16)
+    _VALUE_BIT = np.array([0] + [1 << d for d in range(9)], dtype=np.uint16)
+    _POPCOUNT = np.array(BIT_COUNT, dtype=np.int8)
+    _BIT_VALUE = np.zeros(ALL_DIGITS + 1, dtype=np.int8)
+    for _bit, _digit in BIT_DIGIT.items():
+        _BIT_VALUE[_bit] = _digit
+
+
+def propagate_batch(values):
+    """
+    Fills naked and hidden singles into every board of `values`, an int8
+    (B, 81) array of cell values, in place, until no board changes any more.
+    Returns a bool array that is True for the boards found to have no
+    solution (their values are then left as they were in the last
+    consistent round).
+    """
+    dead = np.zeros(len(values), dtype=bool)
+    active = np.arange(len(values))
+    while active.size:
+        current = values[active]
+        empty = current == 0
+        unit_bits = _VALUE_BIT[current][:, _UNITS]                         # (A, 27, 9)
+        used = np.bitwise_or.reduce(unit_bits, axis=2)                     # (A, 27)
+        seen = np.bitwise_or.reduce(used[:, _CELL_UNITS], axis=2)          # (A, 81)
+        cands = np.where(empty, ALL_DIGITS & ~seen, 0).astype(np.uint16)
+
+        # Per unit, the candidate digits that fit in at least one / two cells
+        unit_cands = cands[:, _UNITS]                                      # (A, 27, 9)
+        once = np.zeros_like(used)
+        twice = np.zeros_like(used)
+        for k in range(9):
+            twice |= once & unit_cands[:, :, k]
+            once |= unit_cands[:, :, k]
+
+        # A digit twice in a unit, an empty cell without candidates, or a
+        # digit with no place left in a unit
+        bad = (unit_bits.sum(axis=2, dtype=np.int32) != used).any(axis=1)
+        bad |= (empty & (cands == 0)).any(axis=1)
+        bad |= ((once | used) != ALL_DIGITS).any(axis=1)
+
+        # Hidden singles: the digits with one possible cell in some unit of
+        # the cell. Two of them forced into the same cell is a contradiction.
+        hidden = cands & np.bitwise_or.reduce((once & ~twice)[:, _CELL_UNITS], axis=2)
+        bad |= (_POPCOUNT[hidden] > 1).any(axis=1)
+
+        # Naked singles (one candidate left) and hidden singles together
+        single = np.where(hidden != 0, hidden, np.where(_POPCOUNT[cands] == 1, cands, 0))
+        filled = current + _BIT_VALUE[single]
+
+        dead[active[bad]] = True
+        changed = ~bad & (filled != current).any(axis=1)
+        values[active[changed]] = filled[changed]
+        # Boards that just filled up go round once more to be checked
+        active = active[changed]
+    return dead
+
+
+def find_all_solutions_batch(boards, max_solutions=2, backend=DEFAULT_BACKEND):
+    """
+    Returns [find_all_solutions(board, max_solutions, backend) for board in
+    boards], with the propagation of all 9x9 boards done as a batch in NumPy.
+    Boards are 9x9 lists of lists or board.Board objects, like everywhere
+    else; `backend` solves the boards that still need a search.
+    """
+    results = [None] * len(boards)
+    if np is not None:
+        flat = [board_values(board) for board in boards]
+        nine = [i for i, cells in enumerate(flat) if len(cells) == 81]
+        if nine:
+            values = np.array([flat[i] for i in nine], dtype=np.int16)
+            in_range = ((values >= 0) & (values <= 9)).all(axis=1)
+            nine = [i for i, ok in zip(nine, in_range) if ok]
+            values = values[in_range].astype(np.int8)
+            dead = propagate_batch(values)
+            for k, i in enumerate(nine):
+                rows = values[k].reshape(9, 9).tolist()
+                if dead[k]:
+                    results[i] = []
+                elif values[k].all():
+                    results[i] = [rows] if max_solutions > 0 else []
+                else:
+                    results[i] = find_all_solutions(rows, max_solutions, backend)
+    for i, board in enumerate(boards):
+        if results[i] is None:
+            results[i] = find_all_solutions(board, max_solutions, backend)
+    return results
+
+
+def solve_first_batch(boards, backend=DEFAULT_BACKEND):
+    """[solve_first(board, backend) for board in boards], see find_all_solutions_batch."""
+    return [solutions[0] if solutions else None for solutions in find_all_solutions_batch(boards, 1, backend)]